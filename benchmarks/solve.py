@@ -0,0 +1,250 @@
+"""
+Model build / solve benchmark over floor sizes, grid sizes and tile sets.
+
+    python -m benchmarks.solve run -o results.json [--quick] [--time 30] [--lns]
+    python -m benchmarks.solve compare baseline.json results.json [--tolerance 0.2]
+
+Every case runs in its own interpreter, so peak RSS is per case, and
+CP-SAT gets a fixed random seed and worker count. For each case we
+record model build time, variable / constraint counts, time to the first
+feasible solution, time to optimal (if proven), final objective, bound
+and gap, and peak RSS. compare flags cases that got slower, bigger or
+worse than the baseline and exits non-zero if there are any.
+
+With --lns the cases are solved by core.lns instead of the flat model,
+under the same ids and time limits, so comparing a flat run against an
+LNS run shows where LNS ends up with a better objective at equal time.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SEED = 12345
+WORKERS = 8
+
+FLOOR_SIZES = [(120, 120), (160, 120), (240, 240)]
+GRID_SIZES = [20, 10]
+QUICK_FLOOR_SIZES = [(120, 120)]
+QUICK_GRID_SIZES = [20]
+
+
+def tile_sets():
+    """Named subsets of the GUI's default tile types (id, w, h, cost, min, max)."""
+    from gui.gui import TilingApp
+    default = TilingApp.DEFAULT_TILE_TYPES
+    return {
+        "default": default,
+        "small": [t for t in default if t[0] in (1, 2, 3)],
+        "rect": [t for t in default if t[1] != t[2] or t[0] == 1],
+    }
+
+
+def make_case(floor, grid_size, set_name, tiles, time_limit, lns=False):
+    width, height = floor
+    return {
+        "id": f"{width}x{height}-g{grid_size}-{set_name}",
+        "width": width,
+        "height": height,
+        "lns": lns,
+        "config": {
+            "formats": {t[0]: (t[1], t[2]) for t in tiles},
+            "weights": {t[0]: t[3] for t in tiles},
+            "min_counts": {t[0]: t[4] for t in tiles},
+            "max_counts": {t[0]: t[5] for t in tiles},
+            "grid_size": grid_size,
+            "max_time_in_seconds": time_limit,
+            "num_search_workers": WORKERS,
+            "random_seed": SEED,
+        },
+    }
+
+
+def run_case(case):
+    """Runs in the child interpreter; returns the measurements."""
+    from core.cli import make_config
+    from core.tiling import TilingModel
+    # core.tiling imports OR-Tools lazily; keep that out of the build time
+    import ortools.sat.python.cp_model  # noqa: F401
+
+    cfg = make_config(case["config"])
+    if case.get("lns"):
+        return run_lns_case(case, cfg)
+    t0 = time.perf_counter()
+    model = TilingModel(case["width"], case["height"], cfg)
+    t1 = time.perf_counter()
+    proto = model.model.Proto()
+    variables, constraints = len(proto.variables), len(proto.constraints)
+
+    first = []
+
+    def on_solution(placements, objective, bound):
+        if not first:
+            first.append(time.perf_counter())
+
+    result = model.solve(on_solution=on_solution)
+    t2 = time.perf_counter()
+
+    objective, bound = result.objective, result.best_bound
+    gap = None
+    if objective is not None:
+        gap = abs(objective - bound) / max(1.0, abs(objective))
+    return {
+        "id": case["id"],
+        "status": result.status,
+        "build_time": t1 - t0,
+        "variables": variables,
+        "constraints": constraints,
+        "time_to_first": first[0] - t1 if first else None,
+        "time_to_optimal": t2 - t1 if result.status == "OPTIMAL" else None,
+        "objective": objective,
+        "best_bound": bound,
+        "gap": gap,
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                       / (1024 * 1024 if sys.platform == "darwin" else 1024),
+    }
+
+
+def run_lns_case(case, cfg):
+    from core.lns import solve_lns
+
+    result = solve_lns(case["width"], case["height"], cfg)
+    objective, bound = result.objective, result.best_bound
+    gap = None
+    if objective is not None and bound is not None:
+        gap = abs(objective - bound) / max(1.0, abs(objective))
+    solve_time = sum(t for phase, t in result.timings.items()
+                     if phase in ("coarse", "solve", "lns"))
+    return {
+        "id": case["id"],
+        "status": result.status,
+        "build_time": sum(result.timings.values()) - solve_time,
+        "variables": result.num_variables,
+        "constraints": result.num_constraints,
+        "time_to_first": result.trajectory[0][0] if result.trajectory else None,
+        "time_to_optimal": solve_time if result.status == "OPTIMAL" else None,
+        "objective": objective,
+        "best_bound": bound,
+        "gap": gap,
+        "trajectory": result.trajectory,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                       / (1024 * 1024 if sys.platform == "darwin" else 1024),
+    }
+
+
+def run(args):
+    floors = QUICK_FLOOR_SIZES if args.quick else FLOOR_SIZES
+    grids = QUICK_GRID_SIZES if args.quick else GRID_SIZES
+    cases = [make_case(floor, grid, name, tiles, args.time, args.lns)
+             for floor, grid, (name, tiles)
+             in itertools.product(floors, grids, tile_sets().items())]
+
+    results = []
+    for case in cases:
+        out = subprocess.run([sys.executable, "-m", "benchmarks.solve", "_case",
+                              json.dumps(case)],
+                             cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        results.append(result)
+        print(f"{result['id']:>24}: {result['status']:<10} "
+              f"build {result['build_time']:.2f} s, objective {result['objective']}, "
+              f"{result['peak_rss_mb']:.0f} MB", file=sys.stderr)
+
+    import ortools
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "ortools": ortools.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": SEED,
+            "workers": WORKERS,
+            "time_limit": args.time,
+            "lns": args.lns,
+        },
+        "cases": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return 0
+
+
+# metric -> lower is better; None values (not reached) count as infinitely slow
+_TIMED = ("build_time", "time_to_first", "time_to_optimal")
+_SIZES = ("variables", "constraints", "peak_rss_mb")
+
+
+def compare(args):
+    with open(args.baseline, encoding="utf-8") as f:
+        base = {c["id"]: c for c in json.load(f)["cases"]}
+    with open(args.current, encoding="utf-8") as f:
+        current = {c["id"]: c for c in json.load(f)["cases"]}
+
+    regressions = []
+    for case_id in sorted(base.keys() & current.keys()):
+        old, new = base[case_id], current[case_id]
+        for metric in _TIMED + _SIZES:
+            a, b = old.get(metric), new.get(metric)
+            if a is not None and b is None:
+                regressions.append(f"{case_id}: {metric} no longer reached")
+            elif a is not None and b is not None:
+                # small absolute slack so millisecond noise doesn't count
+                slack = args.min_seconds if metric in _TIMED else 0
+                if b > a * (1 + args.tolerance) + slack:
+                    regressions.append(f"{case_id}: {metric} {a:.3g} -> {b:.3g}")
+        a, b = old.get("objective"), new.get("objective")
+        if a is not None and (b is None or b > a):
+            regressions.append(f"{case_id}: objective {a} -> {b}")
+
+    missing = sorted(base.keys() - current.keys())
+    for case_id in missing:
+        print(f"{case_id}: missing from current results")
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"no regressions in {len(base.keys() & current.keys())} cases")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.solve")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="run the benchmark matrix")
+    p_run.add_argument("-o", "--output", default="bench_results.json")
+    p_run.add_argument("--time", type=float, default=30,
+                       help="solver time limit per case (default: %(default)s s)")
+    p_run.add_argument("--quick", action="store_true",
+                       help="only the smallest floor and grid")
+    p_run.add_argument("--lns", action="store_true",
+                       help="solve with large-neighbourhood search (core.lns)")
+
+    p_cmp = sub.add_parser("compare", help="flag regressions against a baseline")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current")
+    p_cmp.add_argument("--tolerance", type=float, default=0.2,
+                       help="allowed relative slowdown / growth (default: %(default)s)")
+    p_cmp.add_argument("--min-seconds", type=float, default=0.05,
+                       help="absolute slack on timings (default: %(default)s s)")
+
+    p_case = sub.add_parser("_case")
+    p_case.add_argument("case")
+
+    args = parser.parse_args(argv)
+    if args.command == "_case":
+        print(json.dumps(run_case(json.loads(args.case))))
+        return 0
+    return run(args) if args.command == "run" else compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Startup-time benchmark for the GUI.
+
+    python -m benchmarks.startup [--repeat 5] [--max-seconds 0.5]
+
+Each run starts a fresh interpreter, times `import gui.gui` and checks
+that it didn't pull in OR-Tools, matplotlib, NumPy or PIL, which are
+meant to load lazily. If a display is available it also times creating
+TilingApp until its first event loop pass. Exits non-zero when a heavy
+module is imported eagerly or the median startup exceeds --max-seconds.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("ortools", "matplotlib", "numpy", "PIL")
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import gui.gui
+t1 = time.perf_counter()
+heavy = [m for m in %r if m in sys.modules]
+window = None
+try:
+    app = gui.gui.TilingApp()
+    app.update()
+    window = time.perf_counter() - t0
+    app.destroy()
+except Exception:
+    pass  # no display
+print(json.dumps({"import": t1 - t0, "window": window, "heavy": heavy}))
+""" % (HEAVY_MODULES,)
+
+
+def probe():
+    out = subprocess.run([sys.executable, "-c", _PROBE], cwd=ROOT,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=0.5,
+                        help="fail if the median startup is slower (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    runs = [probe() for _ in range(args.repeat)]
+    imports = statistics.median(r["import"] for r in runs)
+    windows = [r["window"] for r in runs if r["window"] is not None]
+    heavy = sorted({m for r in runs for m in r["heavy"]})
+
+    print(f"import gui.gui: {imports * 1000:.0f} ms (median of {len(runs)})")
+    startup = imports
+    if windows:
+        startup = statistics.median(windows)
+        print(f"window ready:   {startup * 1000:.0f} ms")
+    else:
+        print("window ready:   skipped (no display)")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: imported eagerly: {', '.join(heavy)}")
+        failed = True
+    if startup > args.max_seconds:
+        print(f"FAIL: startup above {args.max_seconds:g} s")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import dataclasses
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple, Union
+
+from core.tiling import TilingConfig, TilingModel, TilingResult, make_model
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".torus_tiling", "cache.sqlite")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Fields that only affect how long / how wide we search, not the problem.
+_RUNTIME_FIELDS = {"max_time_in_seconds", "num_search_workers", "random_seed",
+                   "solver_parameters", "multiscale", "formulation", "backend"}
+
+
+def _normalize(value):
+    if isinstance(value, dict):
+        return sorted([str(k), _normalize(v)] for k, v in value.items())
+    if isinstance(value, (tuple, list)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def config_key(width_cm: int, height_cm: int, cfg: TilingConfig) -> str:
+    """
+    Stable hash of a problem instance. Runtime knobs (time limit, workers)
+    are left out, dict fields are sorted and integral floats become ints,
+    so e.g. a cost typed as 3.0 in the GUI hits the same entry as 3.
+    """
+    data = {f.name: _normalize(getattr(cfg, f.name))
+            for f in dataclasses.fields(cfg)
+            if f.name not in _RUNTIME_FIELDS}
+    data["width_cm"] = width_cm
+    data["height_cm"] = height_cm
+    blob = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+@dataclass
+class CachedSolution:
+    placements: List[Tuple[int, int, int, int]]
+    status: str
+    objective: float
+
+
+class SolutionCache:
+    """
+    SQLite-backed store of the best known solution per problem instance.
+    The file is kept under max_bytes by evicting least recently used
+    entries. A connection is opened per call, so the cache can be shared
+    between threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS solutions ("
+                " key TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " objective REAL NOT NULL,"
+                " placements TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, width_cm: int, height_cm: int,
+            cfg: TilingConfig) -> Optional[CachedSolution]:
+        key = config_key(width_cm, height_cm, cfg)
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT status, objective, placements FROM solutions WHERE key = ?",
+                (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE solutions SET last_used = ? WHERE key = ?",
+                         (time.time(), key))
+        status, objective, placements = row
+        return CachedSolution([tuple(p) for p in json.loads(placements)],
+                              status, objective)
+
+    def put(self, width_cm: int, height_cm: int, cfg: TilingConfig,
+            placements, status: str, objective: float) -> bool:
+        """
+        Store a solution unless the cache already holds one that is at
+        least as good. Returns True if the entry was written.
+        """
+        key = config_key(width_cm, height_cm, cfg)
+        blob = json.dumps([list(p) for p in placements], separators=(",", ":"))
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT status, objective FROM solutions WHERE key = ?",
+                (key,)).fetchone()
+            if row is not None:
+                old_status, old_objective = row
+                if old_status == "OPTIMAL" or \
+                        (objective >= old_objective and status != "OPTIMAL"):
+                    return False
+            conn.execute(
+                "INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?)",
+                (key, status, objective, blob, len(blob) + len(key), time.time()))
+            self._evict(conn)
+        return True
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM solutions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute(
+                "SELECT key, size FROM solutions ORDER BY last_used").fetchall():
+            conn.execute("DELETE FROM solutions WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM solutions")
+
+
+def cached_solve(width_cm: int, height_cm: int, cfg: TilingConfig,
+                 cache: Optional[SolutionCache],
+                 model: Union[TilingModel, Callable, None] = None,
+                 on_solution: Optional[Callable] = None) -> TilingResult:
+    """
+    solve_torus_tiling with a cache in front of it. An OPTIMAL entry is
+    returned without solving; a FEASIBLE one warm-starts the solver and
+    is replaced only if the new solve improves on it. model may be a
+    TilingModel (or ExactCoverModel) already built for this floor, to be
+    reused, or a function building one, called only on a cache miss; by
+    default make_model picks one for cfg.backend. on_solution is passed
+    on to its solve. Results served from the cache have cached=True.
+    """
+    hit = cache.get(width_cm, height_cm, cfg) if cache is not None else None
+    if hit is not None and hit.status == "OPTIMAL":
+        return TilingResult(status=hit.status, placements=hit.placements,
+                            width_cm=width_cm, height_cm=height_cm,
+                            grid_size=cfg.grid_size, objective=hit.objective,
+                            best_bound=hit.objective, cached=True)
+
+    if model is None:
+        model = make_model(width_cm, height_cm, cfg)
+    elif callable(model):
+        model = model()
+    if cache is None:
+        return model.solve(cfg, on_solution=on_solution)
+
+    result = model.solve(cfg, hint=hit.placements if hit else None,
+                         on_solution=on_solution)
+    if hit is not None and (not result.found or
+                            (result.objective >= hit.objective and
+                             result.status != "OPTIMAL")):
+        # keep the cached solution, but report this solve's timings
+        return dataclasses.replace(result, status=hit.status,
+                                   placements=hit.placements,
+                                   objective=hit.objective, cached=True)
+
+    if result.found:
+        cache.put(width_cm, height_cm, cfg, result.placements,
+                  result.status, result.objective)
+    return result
@@ -0,0 +1,239 @@
+"""
+Headless batch mode.
+
+    python -m core.cli jobs.json -o results.jsonl [--png-dir out/] [--npz-dir out/]
+
+The job file (JSON, or YAML if PyYAML is installed) holds:
+
+    defaults:  TilingConfig fields shared by every job
+    jobs:      list of {"id"?, "width", "height", <TilingConfig fields>}
+    sweep:     {"width": [...], "height": [...], <field>: [...]} -- every
+               combination of the listed alternatives becomes a job
+
+Jobs run in a process pool; with --lns each job is improved by large-
+neighbourhood search (core.lns) after its first solution, and with
+--portfolio each job is solved by a portfolio of differently configured
+solves (core.portfolio). Each finished job is appended to the output
+as one JSON line, and jobs whose id is already in the output are skipped,
+so an interrupted run can simply be restarted.
+"""
+import argparse
+import dataclasses
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import reduce
+from math import gcd
+
+from core.cache import _normalize
+from core.lns import solve_lns
+from core.portfolio import solve_portfolio
+from core.solution import TilingSolution
+from core.tiling import TilingConfig, draw_tiling, solve_torus_tiling
+
+
+_INT_KEYED = ("formats", "weights", "min_counts", "max_counts")
+_CONFIG_FIELDS = {f.name for f in dataclasses.fields(TilingConfig)}
+
+
+def load_job_file(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise SystemExit("PyYAML is required to read YAML job files")
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+
+def make_config(fields: dict) -> TilingConfig:
+    """TilingConfig from JSON-ish data: string dict keys, lists for tuples."""
+    fields = dict(fields)
+    unknown = set(fields) - _CONFIG_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown TilingConfig fields: {sorted(unknown)}")
+    for name in _INT_KEYED:
+        if name in fields:
+            fields[name] = {int(k): v for k, v in fields[name].items()}
+    fields["formats"] = {k: tuple(v) for k, v in fields["formats"].items()}
+    if "grid_size" not in fields:
+        # same rule as the GUI: GCD of all tile dimensions
+        fields["grid_size"] = reduce(gcd, [d for dims in fields["formats"].values() for d in dims])
+    return TilingConfig(**fields)
+
+
+def job_key(width: int, height: int, cfg: TilingConfig) -> str:
+    """
+    Default job id: a hash of every field of the job. Unlike
+    core.cache.config_key it includes the runtime fields, so a sweep over
+    e.g. the time limit gives each job its own id.
+    """
+    data = {name: _normalize(value) for name, value in dataclasses.asdict(cfg).items()}
+    data["width"], data["height"] = width, height
+    blob = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode()).hexdigest()[:16]
+
+
+def expand_jobs(spec: dict):
+    """
+    List of (job_id, width, height, TilingConfig) described by a job file.
+    Raises ValueError if two jobs have the same id.
+    """
+    defaults = spec.get("defaults", {})
+    entries = list(spec.get("jobs", []))
+
+    sweep = spec.get("sweep")
+    if sweep:
+        names = list(sweep)
+        for combo in itertools.product(*(sweep[n] for n in names)):
+            entries.append(dict(zip(names, combo)))
+
+    jobs, seen = [], set()
+    for entry in entries:
+        entry = dict(entry)
+        job_id = entry.pop("id", None)
+        width, height = int(entry.pop("width")), int(entry.pop("height"))
+        cfg = make_config({**defaults, **entry})
+        job_id = str(job_id) if job_id is not None else job_key(width, height, cfg)
+        if job_id in seen:
+            # finished_ids would skip the second one on a restart
+            raise ValueError(f"Duplicate job id {job_id!r}")
+        seen.add(job_id)
+        jobs.append((job_id, width, height, cfg))
+    return jobs
+
+
+def finished_ids(path: str) -> set:
+    """Ids of jobs already written to a results file."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError):
+                pass  # a line cut short by an interrupted run
+    return done
+
+
+def run_job(job_id: str, width: int, height: int, cfg: TilingConfig,
+            png_dir=None, lns: bool = False, portfolio: bool = False,
+            npz_dir=None) -> dict:
+    """Solve one job; returns its JSON-serializable result record."""
+    if lns:
+        result = solve_lns(width, height, cfg)
+    elif portfolio:
+        # one member per search worker of the job
+        result = solve_portfolio(width, height, cfg, processes=cfg.num_search_workers)
+    else:
+        result = solve_torus_tiling(width, height, cfg)
+
+    record = {
+        "id": job_id,
+        "width": width,
+        "height": height,
+        "status": result.status,
+        "objective": result.objective,
+        "best_bound": result.best_bound,
+        "placements": [list(p) for p in result.placements] if result.found else None,
+        "timings": dict(result.timings),
+        "num_variables": result.num_variables,
+        "num_constraints": result.num_constraints,
+        "stats": result.stats,
+        "trajectory": result.trajectory,
+        "reason": result.reason,
+    }
+    if result.found and png_dir:
+        t0 = time.perf_counter()
+        path = os.path.join(png_dir, f"{job_id}.png")
+        draw_tiling(result.placements, width, height, cfg.grid_size, cfg.formats).save(path)
+        record["png"] = path
+        record["timings"]["render"] = time.perf_counter() - t0
+    if result.found and npz_dir:
+        path = os.path.join(npz_dir, f"{job_id}.npz")
+        TilingSolution.from_result(result, cfg.formats).save(path)
+        record["npz"] = path
+    return record
+
+
+def split_cores(num_jobs: int, cores: int, concurrency=None):
+    """
+    (parallel jobs, search workers per job). CP-SAT scales sublinearly
+    with workers, so by default we run as many jobs side by side as there
+    are cores for, while keeping at least 4 workers per job.
+    """
+    if concurrency is None:
+        concurrency = max(1, cores // 4)
+    concurrency = max(1, min(concurrency, num_jobs, cores))
+    return concurrency, max(1, cores // concurrency)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.cli",
+                                     description="Solve a batch of torus tilings.")
+    parser.add_argument("job_file", help="JSON or YAML job file")
+    parser.add_argument("-o", "--output", default="results.jsonl",
+                        help="JSONL results file, appended to (default: %(default)s)")
+    parser.add_argument("--png-dir", help="also write a 3x3 preview PNG per job")
+    parser.add_argument("--npz-dir", help="also write each tiling as a TilingSolution .npz")
+    parser.add_argument("--cores", type=int, default=os.cpu_count() or 1,
+                        help="CPU cores to use in total (default: all)")
+    parser.add_argument("--parallel", type=int,
+                        help="jobs solved at the same time (default: cores // 4)")
+    parser.add_argument("--workers", type=int,
+                        help="search workers per job (default: cores // parallel)")
+    strategy = parser.add_mutually_exclusive_group()
+    strategy.add_argument("--lns", action="store_true",
+                          help="improve each job by large-neighbourhood search, "
+                               "the workers solving windows in parallel")
+    strategy.add_argument("--portfolio", action="store_true",
+                          help="solve each job with a portfolio of differently "
+                               "configured solves, one per worker")
+    args = parser.parse_args(argv)
+
+    jobs = expand_jobs(load_job_file(args.job_file))
+    done = finished_ids(args.output)
+    pending = [job for job in jobs if job[0] not in done]
+    print(f"{len(jobs)} jobs, {len(jobs) - len(pending)} already done", file=sys.stderr)
+    if not pending:
+        return 0
+    for directory in (args.png_dir, args.npz_dir):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    parallel, workers = split_cores(len(pending), args.cores, args.parallel)
+    workers = args.workers or workers
+
+    with ProcessPoolExecutor(max_workers=parallel) as pool, \
+            open(args.output, "a", encoding="utf-8") as out:
+        futures = {
+            pool.submit(run_job, job_id, width, height,
+                        dataclasses.replace(cfg, num_search_workers=workers),
+                        args.png_dir, args.lns, args.portfolio, args.npz_dir): job_id
+            for job_id, width, height, cfg in pending
+        }
+        for future in as_completed(futures):
+            job_id = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                # not written, so the job is retried on the next run
+                print(f"{job_id}: failed: {e}", file=sys.stderr)
+                continue
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            reason = f" ({record['reason']})" if record["reason"] else ""
+            print(f"{job_id}: {record['status']} objective={record['objective']}{reason}",
+                  file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
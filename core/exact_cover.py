@@ -0,0 +1,284 @@
+"""
+Exact-cover search for a valid tiling, without CP-SAT.
+
+On small tori we usually want any valid tiling, and fast. Starting
+CP-SAT (presolve, workers, LP) costs more than the answer. This backend
+is a depth-first exact-cover search over the same (k, i, j, o)
+placements. Cells and placements are bitsets (Python ints), and each
+step covers the lowest empty cell with every placement that fits there,
+cheapest per cell first. The rules are checked along the way:
+
+    max counts     a format at its maximum is no longer tried
+    min counts     the empty cells must still hold the missing tiles
+    straight line  a line no tile crosses yet needs a pair of empty cells
+                   side by side across it
+    wrap           some vertical and some horizontal line must be crossed;
+                   the tiling is then shifted so that both lie on the edge
+
+Formats below their min count are tried first. The first tiling found
+is returned as FEASIBLE. Costs only order the search, so it is cheap,
+not optimal. An exhausted search proves the floor INFEASIBLE. With
+backend "auto" the search gets AUTO_TIME_SHARE of the time limit, and
+CP-SAT the rest if it neither finds a tiling nor proves there is none.
+"""
+import dataclasses
+import time
+
+from typing import Callable, Dict, Optional
+
+from core.precheck import infeasible
+from core.tiling import (TilingConfig, TilingModel, TilingResult, _PhaseTimer,
+                         _objective_value, _placement_cells, _tile_cells)
+
+AUTO_TIME_SHARE = 0.25
+
+
+class _Interrupted(Exception):
+    pass
+
+
+class ExactCoverModel:
+    """
+    Placement bitsets of one floor, searched per solve(). Has the
+    solve / stop / matches interface of TilingModel, so callers can use
+    either; the rules and costs are read from the config at solve time.
+    """
+
+    def __init__(self, width_cm: int, height_cm: int, cfg: TilingConfig):
+        G = cfg.grid_size
+        assert width_cm % G == 0 and height_cm % G == 0, \
+            f"Floor dims must be multiples of {G}"
+        W, H = width_cm // G, height_cm // G
+        self.width_cm, self.height_cm, self.G = width_cm, height_cm, G
+        self.W, self.H = W, H
+        self.key = self.structure_key(width_cm, height_cm, cfg)
+        self.cfg = cfg
+        self.last_placements = None
+        self.build_timings = {}
+        self._stop_requested = False
+        self._fallback = None
+        timer = _PhaseTimer(self.build_timings)
+
+        # rotating a square places the same cells, so one orientation each
+        self.tile_cells = _tile_cells(cfg.formats, G, dedupe_squares=True)
+
+        # (mask, key, crossed vertical lines, crossed horizontal lines,
+        # cells) per placement. Like TilingModel, a tile longer than the
+        # torus is placed wrapped onto itself, covering the whole row or
+        # column once.
+        self.placements = []
+        for k, orientations in self.tile_cells.items():
+            for o, (wc, hc) in enumerate(orientations):
+                for i in range(W):
+                    for j in range(H):
+                        cells = _placement_cells(i, j, wc, hc, W, H)
+                        mask = 0
+                        for x, y in cells:
+                            mask |= 1 << (x * H + y)
+                        vlines = sum(1 << ((i + d) % W) for d in range(1, min(wc, W)))
+                        hlines = sum(1 << ((j + d) % H) for d in range(1, min(hc, H)))
+                        # on a one-cell torus there is no line to cross, but
+                        # a longer tile still wraps (i + wc > W in TilingModel)
+                        if W == 1 and wc > 1:
+                            vlines = 1
+                        if H == 1 and hc > 1:
+                            hlines = 1
+                        self.placements.append((mask, (k, i, j, o), vlines, hlines,
+                                                len(cells)))
+        timer.lap("placements")
+
+    @staticmethod
+    def structure_key(width_cm: int, height_cm: int, cfg: TilingConfig):
+        return (width_cm, height_cm, cfg.grid_size, tuple(sorted(cfg.formats.items())))
+
+    def matches(self, width_cm: int, height_cm: int, cfg: TilingConfig) -> bool:
+        return self.key == self.structure_key(width_cm, height_cm, cfg)
+
+    def stop(self):
+        """Ask a running solve() to give up. Safe to call from another thread."""
+        self._stop_requested = True
+        fallback = self._fallback
+        if fallback is not None:
+            fallback.stop()
+
+    def solve(self, cfg: Optional[TilingConfig] = None, hint=None,
+              on_solution: Optional[Callable] = None) -> TilingResult:
+        """
+        First valid tiling under the rules and count bounds of cfg
+        (default: the config the model was built with), searched within
+        cfg.max_time_in_seconds. hint is accepted for TilingModel
+        compatibility and ignored. on_solution(placements, objective,
+        bound) is called once, when the tiling is found.
+        """
+        cfg = cfg or self.cfg
+        try:
+            if cfg.backend != "auto":
+                return self._search(cfg, cfg.max_time_in_seconds, on_solution)
+            t0 = time.perf_counter()
+            result = self._search(cfg, cfg.max_time_in_seconds * AUTO_TIME_SHARE,
+                                  on_solution)
+            remaining = cfg.max_time_in_seconds - (time.perf_counter() - t0)
+            if result.status != "UNKNOWN" or self._stop_requested or remaining <= 0:
+                return result
+            self._fallback = TilingModel(self.width_cm, self.height_cm, cfg)
+            fallback = self._fallback.solve(
+                dataclasses.replace(cfg, max_time_in_seconds=remaining),
+                on_solution=on_solution)
+        finally:
+            self._fallback = None
+            self._stop_requested = False
+        fallback.timings["exact_cover"] = result.timings["solve"]
+        fallback.stats["exact_cover_nodes"] = result.stats["nodes"]
+        return fallback
+
+    def _search(self, cfg: TilingConfig, time_limit: float,
+                on_solution: Optional[Callable]) -> TilingResult:
+        rejected = infeasible(self.width_cm, self.height_cm, cfg)
+        if rejected is not None:
+            return rejected
+        timings = dict(self.build_timings)
+        timer = _PhaseTimer(timings)
+        t0 = time.perf_counter()
+        deadline = t0 + time_limit
+        W, H = self.W, self.H
+        full = (1 << (W * H)) - 1
+        # fewest cells a tile of each format can cover, for the min counts
+        area = {k: W * H for k in self.tile_cells}
+        for _, (k, *_), _, _, cells in self.placements:
+            area[k] = min(area[k], cells)
+        min_c = {k: cfg.min_counts.get(k, 0) for k in self.tile_cells}
+        max_c = {k: cfg.max_counts.get(k, W * H * 2) for k in self.tile_cells}
+
+        # 1) candidates per cell, cheapest per cell first, then larger
+        candidates = [[] for _ in range(W * H)]
+        order = sorted(self.placements, key=lambda p: (
+            cfg.weights.get(p[1][0], 0) / p[4], -p[4]))
+        for p in order:
+            mask = p[0]
+            while mask:
+                low = mask & -mask
+                candidates[low.bit_length() - 1].append(p)
+                mask ^= low
+        # any tiling can be shifted to have a tile anchored at (0,0); with
+        # the wrap rule alone we shift at the end instead, see below
+        if not cfg.enforce_wrap or cfg.enforce_no_straight_lines:
+            candidates[0] = [p for p in candidates[0] if p[1][1:3] == (0, 0)]
+
+        # 2) a line can still be crossed while some pair of cells across it
+        #    is empty: shifting the empty cells left of (above) the line by
+        #    one column (row) must hit an empty cell right of (below) it
+        column = [sum(1 << (x * H + y) for y in range(H)) for x in range(W)]
+        row = [sum(1 << (x * H + y) for x in range(W)) for y in range(H)]
+        all_v, all_h = (1 << W) - 1, (1 << H) - 1
+        lines, wrap = cfg.enforce_no_straight_lines, cfg.enforce_wrap
+
+        def dead(covered, crossed_v, crossed_h):
+            free = full & ~covered
+            for b in range(W):
+                if not crossed_v >> b & 1:
+                    left = free & column[b - 1]
+                    left = left << H if b else left >> (W - 1) * H
+                    if not left & free:
+                        return True
+            for r in range(H):
+                if not crossed_h >> r & 1:
+                    above = free & row[r - 1]
+                    above = above << 1 if r else above >> (H - 1)
+                    if not above & free:
+                        return True
+            return False
+
+        # 3) depth-first search, the lowest empty cell first. The stack
+        #    holds per depth the state (covered, filled, crossed lines),
+        #    the placements for its lowest empty cell and the next one to
+        #    try; a recursion would run out of stack on larger floors.
+        counts: Dict[int, int] = {k: 0 for k in self.tile_cells}
+        chosen, crossed = [], []
+        nodes = 0
+
+        def options(covered):
+            free = full & ~covered
+            found = candidates[(free & -free).bit_length() - 1]
+            if any(counts[k] < min_c[k] for k in counts):
+                # stable: cheapest first within both groups
+                found = sorted(found, key=lambda p: counts[p[1][0]] >= min_c[p[1][0]])
+            return found
+
+        def complete(state):
+            _, _, crossed_v, crossed_h = state
+            crossed[:] = [crossed_v, crossed_h]
+            return (all(counts[k] >= min_c[k] for k in counts)
+                    and (not lines or (crossed_v == all_v and crossed_h == all_h))
+                    and (not wrap or (crossed_v and crossed_h)))
+
+        def search():
+            nonlocal nodes
+            root = (0, 0, 0, 0)
+            stack = [[root, options(0), 0]]
+            while stack:
+                frame = stack[-1]
+                (covered, filled, crossed_v, crossed_h), found, pos = frame
+                if len(chosen) == len(stack):
+                    # back from the child of this depth: take its tile out
+                    counts[chosen.pop()[0]] -= 1
+                child = None
+                while pos < len(found):
+                    mask, key, vlines, hlines, cells = found[pos]
+                    pos += 1
+                    k = key[0]
+                    if mask & covered or counts[k] >= max_c[k]:
+                        continue
+                    counts[k] += 1
+                    missing = sum(max(0, min_c[q] - counts[q]) * area[q] for q in counts)
+                    state = (covered | mask, filled + cells, crossed_v | vlines,
+                             crossed_h | hlines)
+                    if missing <= W * H - state[1] and not (lines and dead(state[0], *state[2:])):
+                        nodes += 1
+                        if nodes % 1024 == 0 and (self._stop_requested
+                                                  or time.perf_counter() > deadline):
+                            raise _Interrupted
+                        chosen.append(key)
+                        if state[0] != full:
+                            child = state
+                            break
+                        if complete(state):
+                            return True
+                        chosen.pop()
+                    counts[k] -= 1
+                frame[2] = pos
+                if child is None:
+                    stack.pop()
+                else:
+                    stack.append([child, options(child[0]), 0])
+            return False
+
+        try:
+            status = "FEASIBLE" if search() else "INFEASIBLE"
+        except _Interrupted:
+            status = "UNKNOWN"
+        timer.lap("solve")
+
+        result = TilingResult(status=status, placements=None,
+                              width_cm=self.width_cm, height_cm=self.height_cm,
+                              grid_size=self.G, timings=timings,
+                              stats={"placements": len(self.placements), "nodes": nodes})
+        if status == "FEASIBLE":
+            placements = chosen
+            if wrap and not lines:
+                # shift a crossed vertical and a crossed horizontal line
+                # onto the edge, so the tiles across them wrap
+                b, r = ((c & -c).bit_length() - 1 for c in crossed)
+                placements = [(k, (i - b) % W, (j - r) % H, o) for k, i, j, o in placements]
+            turned = [o for k, _, _, o in placements if len(self.tile_cells[k]) == 2]
+            if cfg.break_symmetries and cfg.break_dihedral_symmetries and W == H \
+                    and turned.count(1) > turned.count(0):
+                # transposing keeps every rule and the tile at (0,0)
+                placements = [(k, j, i, 1 - o if len(self.tile_cells[k]) == 2 else o)
+                              for k, i, j, o in placements]
+            result.placements = placements
+            result.objective = _objective_value(placements, W, H, self.tile_cells, cfg)
+            result.trajectory.append((time.perf_counter() - t0, result.objective))
+            self.last_placements = placements
+            if on_solution is not None:
+                on_solution(placements, result.objective, None)
+        return result
@@ -0,0 +1,162 @@
+"""
+Full-room export of a periodic tiling.
+
+A room of any size is covered by repeats of the toroidal period, anchored
+at the room's top-left corner. Neither writer ever holds the whole room:
+the SVG defines the period once as a symbol and streams one <use> per
+repeat, and the PNG is compressed strip by strip from a single rasterized
+period. Both write a bill of materials (tiles per format, whole and cut)
+next to the image.
+"""
+import csv
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from typing import Dict, Tuple
+
+from core.render import render_period, tile_colors
+from core.tiling import _tile_cells
+
+
+def _span_counts(x0, size, period, room):
+    """
+    How many translates [x0 + a*period, x0 + a*period + size) intersect
+    [0, room), and how many of those lie entirely inside it.
+    """
+    touching = -((x0 - room) // period) - ((-size - x0) // period) - 1
+    inside = (room - size - x0) // period + (x0 // period) + 1
+    return max(0, touching), max(0, inside)
+
+
+def bill_of_materials(placements, width_cm: int, height_cm: int, G: int,
+                      formats: Dict[int, Tuple[int, int]],
+                      room_width_cm: int, room_height_cm: int):
+    """
+    {format id: {"whole": n, "cut": m, "total": n + m}} for the room. Each
+    placement contributes the number of its repeats touching the room; the
+    count is computed per axis, so the cost doesn't grow with the room.
+    """
+    tile_cells = _tile_cells(formats, G)
+    bom = {k: {"whole": 0, "cut": 0, "total": 0} for k in formats}
+    for k, i, j, o in placements:
+        wc, hc = tile_cells[k][o]
+        nx, fx = _span_counts(i * G, wc * G, width_cm, room_width_cm)
+        ny, fy = _span_counts(j * G, hc * G, height_cm, room_height_cm)
+        bom[k]["total"] += nx * ny
+        bom[k]["whole"] += fx * fy
+    for counts in bom.values():
+        counts["cut"] = counts["total"] - counts["whole"]
+    return bom
+
+
+def write_bom(path: str, bom, formats: Dict[int, Tuple[int, int]]):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        out = csv.writer(f)
+        out.writerow(["id", "width_cm", "height_cm", "whole", "cut", "total"])
+        for k in sorted(bom):
+            w, h = formats[k]
+            out.writerow([k, w, h, bom[k]["whole"], bom[k]["cut"], bom[k]["total"]])
+
+
+def _bom_path(path):
+    return os.path.splitext(path)[0] + ".bom.csv"
+
+
+def export_svg(path: str, placements, width_cm: int, height_cm: int, G: int,
+               formats: Dict[int, Tuple[int, int]],
+               room_width_cm: int, room_height_cm: int):
+    """
+    Stream an SVG of the room, in centimetres. Returns the bill of
+    materials, which is also written to <path>.bom.csv.
+    """
+    tile_cells = _tile_cells(formats, G)
+    colors, _ = tile_colors(formats)
+    rows = {k: n for n, k in enumerate(sorted(formats), start=1)}
+    font = max(G // 3, 8)
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" '
+                f'xmlns:xlink="http://www.w3.org/1999/xlink" '
+                f'width="{room_width_cm}cm" height="{room_height_cm}cm" '
+                f'viewBox="0 0 {room_width_cm} {room_height_cm}">\n')
+        f.write('<defs>\n')
+        f.write(f'<clipPath id="room"><rect width="{room_width_cm}" '
+                f'height="{room_height_cm}"/></clipPath>\n')
+        # tiles wrapping over the period edge are drawn whole, sticking out
+        # of the symbol; neighbouring repeats draw the same tile in the same
+        # place, so the overlap is invisible
+        f.write(f'<symbol id="period" width="{width_cm}" height="{height_cm}" '
+                f'overflow="visible">\n')
+        for k, i, j, o in placements:
+            wc, hc = tile_cells[k][o]
+            x, y, w, h = i * G, j * G, wc * G, hc * G
+            r, g, b = colors[rows[k]]
+            f.write(f'<rect x="{x}" y="{y}" width="{w}" height="{h}" '
+                    f'fill="#{r:02x}{g:02x}{b:02x}" stroke="black" stroke-width="0.5"/>'
+                    f'<text x="{x + w / 2:g}" y="{y + h / 2:g}" font-size="{font}" '
+                    f'text-anchor="middle" dominant-baseline="central">{k}</text>\n')
+        f.write('</symbol>\n</defs>\n')
+
+        f.write('<g clip-path="url(#room)">\n')
+        # start one period before the room, for tiles reaching into it
+        for ry in range(-1, -(-room_height_cm // height_cm)):
+            for rx in range(-1, -(-room_width_cm // width_cm)):
+                f.write(f'<use xlink:href="#period" href="#period" '
+                        f'x="{rx * width_cm}" y="{ry * height_cm}"/>\n')
+        f.write('</g>\n</svg>\n')
+
+    bom = bill_of_materials(placements, width_cm, height_cm, G, formats,
+                            room_width_cm, room_height_cm)
+    write_bom(_bom_path(path), bom, formats)
+    return bom
+
+
+def _png_chunk(f, kind: bytes, data: bytes):
+    f.write(struct.pack(">I", len(data)))
+    f.write(kind)
+    f.write(data)
+    f.write(struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+
+def export_png(path: str, placements, width_cm: int, height_cm: int, G: int,
+               formats: Dict[int, Tuple[int, int]],
+               room_width_cm: int, room_height_cm: int,
+               cell_px: int = 20, strip_rows: int = 256):
+    """
+    Write an RGB PNG of the room, cell_px pixels per grid cell. Only one
+    rasterized period and one strip of strip_rows pixel rows are in
+    memory at a time; the strips go through a single streaming zlib
+    compressor. Returns the bill of materials, which is also written to
+    <path>.bom.csv.
+    """
+    W, H = width_cm // G, height_cm // G
+    period, _ = render_period(placements, W, H, _tile_cells(formats, G), cell_px, formats)
+    ph, pw = period.shape[:2]
+    out_w = room_width_cm * cell_px // G
+    out_h = room_height_cm * cell_px // G
+    reps_x = -(-out_w // pw)
+
+    compressor = zlib.compressobj(6)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        _png_chunk(f, b"IHDR", struct.pack(">IIBBBBB", out_w, out_h, 8, 2, 0, 0, 0))
+        for y0 in range(0, out_h, strip_rows):
+            ys = np.arange(y0, min(y0 + strip_rows, out_h)) % ph
+            strip = np.tile(period[ys], (1, reps_x, 1))[:, :out_w]
+            # every PNG scanline starts with its filter type, 0 = none
+            raw = np.zeros((len(ys), out_w * 3 + 1), dtype=np.uint8)
+            raw[:, 1:] = strip.reshape(len(ys), -1)
+            data = compressor.compress(raw.tobytes())
+            if data:
+                _png_chunk(f, b"IDAT", data)
+        _png_chunk(f, b"IDAT", compressor.flush())
+        _png_chunk(f, b"IEND", b"")
+
+    bom = bill_of_materials(placements, width_cm, height_cm, G, formats,
+                            room_width_cm, room_height_cm)
+    write_bom(_bom_path(path), bom, formats)
+    return bom
@@ -0,0 +1,342 @@
+"""
+Large-neighbourhood search (LNS) around the CP-SAT model, for floors where
+the flat model stalls after its first solution.
+
+Starting from a valid tiling, every round frees rectangular windows of
+the torus (windows may wrap over the edges): placements lying entirely
+inside a window are removed, everything else stays fixed, and a small
+CP-SAT model re-tiles the freed cells with the full objective. The
+sub-model knows the fixed placements, so counts, seams, wrap, symmetry
+rules and four-corner points stay correct for the whole floor.
+
+The windows of one round are a window apart, so they share no lattice
+point and are solved side by side in a process pool. Their gains add up,
+but counts, seams and wrap are global, so the merge takes the windows
+best first and keeps only those that leave the tiling valid.
+"""
+import logging
+import random
+import threading
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from core.precheck import infeasible
+from core.tiling import (TilingConfig, TilingModel, TilingResult, _PhaseTimer,
+                         _build_indexes, _objective_value, _placement_cells,
+                         _tile_cells)
+
+logger = logging.getLogger(__name__)
+
+# share of max_time_in_seconds spent on the starting solution
+START_TIME_SHARE = 0.2
+
+
+def _cells(p, W, H, tile_cells):
+    k, i, j, o = p
+    return _placement_cells(i, j, *tile_cells[k][o], W, H)
+
+
+def _anchor_rule(cfg: TilingConfig) -> bool:
+    """Whether the model pins a tile at cell (0,0), see _add_symmetry_breaking."""
+    return cfg.break_symmetries and (not cfg.enforce_wrap or cfg.enforce_no_straight_lines)
+
+
+def violations(placements, W, H, tile_cells, cfg: TilingConfig):
+    """Rules of cfg broken by a tiling, as messages; empty if it is valid."""
+    found = []
+    covered = {}
+    for p in placements:
+        for cell in _cells(p, W, H, tile_cells):
+            covered[cell] = covered.get(cell, 0) + 1
+    if len(covered) != W * H or any(n != 1 for n in covered.values()):
+        found.append("cells not covered exactly once")
+
+    counts = {k: 0 for k in tile_cells}
+    for k, _, _, _ in placements:
+        counts[k] += 1
+    for k, n in counts.items():
+        if n < cfg.min_counts.get(k, 0):
+            found.append(f"format {k}: {n} below minimum")
+        if n > cfg.max_counts.get(k, W * H * 2):
+            found.append(f"format {k}: {n} above maximum")
+
+    sizes = [(i, j) + tuple(tile_cells[k][o]) for k, i, j, o in placements]
+    if cfg.enforce_wrap:
+        if not any(i + wc > W for i, _, wc, _ in sizes):
+            found.append("no tile wraps horizontally")
+        if not any(j + hc > H for _, j, _, hc in sizes):
+            found.append("no tile wraps vertically")
+    if cfg.enforce_no_straight_lines:
+        cols = {(i + d) % W for i, _, wc, _ in sizes for d in range(1, min(wc, W))}
+        rows = {(j + d) % H for _, j, _, hc in sizes for d in range(1, min(hc, H))}
+        if len(cols) < W or len(rows) < H:
+            found.append("straight line through the floor")
+    if _anchor_rule(cfg) and not any(i == 0 and j == 0 for i, j, _, _ in sizes):
+        found.append("no tile anchored at (0,0)")
+    if cfg.break_symmetries and cfg.break_dihedral_symmetries and W == H:
+        turned = [o for k, _, _, o in placements if len(tile_cells[k]) == 2]
+        if turned.count(1) > turned.count(0):
+            found.append("more turned than upright tiles")
+    return found
+
+
+def _window_cells(x0, y0, ww, wh, W, H):
+    return {((x0 + dx) % W, (y0 + dy) % H) for dx in range(ww) for dy in range(wh)}
+
+
+def _solve_window(task):
+    """
+    Re-optimize one window; runs in a pool worker. Returns (freed, new,
+    optimal): the placements removed, those replacing them and whether
+    the sub-model was solved to optimality; None if nothing was freed
+    or no solution came back.
+    """
+    placements, window, W, H, tile_cells, cfg, time_limit, seed = task
+    from ortools.sat.python import cp_model
+
+    inside = _window_cells(*window, W, H)
+    freed, fixed, free_cells = [], [], set()
+    for p in placements:
+        cells = _cells(p, W, H, tile_cells)
+        if all(c in inside for c in cells):
+            freed.append(p)
+            free_cells.update(cells)
+        else:
+            fixed.append(p)
+    if not freed:
+        return None
+
+    model = cp_model.CpModel()
+
+    # 1) candidate placements inside the freed cells
+    X = {}
+    for k in tile_cells:
+        for o, (wc, hc) in enumerate(tile_cells[k]):
+            for i, j in free_cells:
+                if all(c in free_cells for c in _placement_cells(i, j, wc, hc, W, H)):
+                    X[k, i, j, o] = model.NewBoolVar(f"X_{k}_{i}_{j}_{o}")
+    cover, cols, rows, corners = _build_indexes(W, H, tile_cells, X)
+    _, fixed_cols, fixed_rows, fixed_corners = \
+        _build_indexes(W, H, tile_cells, {p: 1 for p in fixed})
+
+    # 2) coverage of the freed cells
+    for cell in free_cells:
+        model.Add(sum(cover[cell]) == 1)
+
+    # 3) counts of the whole floor
+    for k in tile_cells:
+        n_fixed = sum(1 for p in fixed if p[0] == k)
+        n_new = sum(v for key, v in X.items() if key[0] == k)
+        if cfg.min_counts.get(k, 0) > n_fixed:
+            model.Add(n_new >= cfg.min_counts[k] - n_fixed)
+        if k in cfg.max_counts:
+            model.Add(n_new <= cfg.max_counts[k] - n_fixed)
+
+    # 4) wrap and seams, unless a fixed placement already takes care of them
+    if cfg.enforce_wrap:
+        if not any(i + tile_cells[k][o][0] > W for k, i, j, o in fixed):
+            model.Add(sum(v for (k, i, j, o), v in X.items()
+                          if i + tile_cells[k][o][0] > W) >= 1)
+        if not any(j + tile_cells[k][o][1] > H for k, i, j, o in fixed):
+            model.Add(sum(v for (k, i, j, o), v in X.items()
+                          if j + tile_cells[k][o][1] > H) >= 1)
+    if cfg.enforce_no_straight_lines:
+        for b in range(W):
+            if not fixed_cols[b]:
+                model.Add(sum(cols[b]) >= 1)
+        for r in range(H):
+            if not fixed_rows[r]:
+                model.Add(sum(rows[r]) >= 1)
+
+    # 5) symmetry rules of the full model
+    if _anchor_rule(cfg) and (0, 0) in free_cells:
+        model.Add(sum(v for (k, i, j, o), v in X.items() if i == 0 and j == 0) == 1)
+    if cfg.break_symmetries and cfg.break_dihedral_symmetries and W == H:
+        two = [k for k in tile_cells if len(tile_cells[k]) == 2]
+        upright = sum(1 for k, _, _, o in fixed if k in two and o == 0)
+        turned = sum(1 for k, _, _, o in fixed if k in two and o == 1)
+        model.Add(sum(v for key, v in X.items() if key[0] in two and key[3] == 0)
+                  - sum(v for key, v in X.items() if key[0] in two and key[3] == 1)
+                  >= turned - upright)
+
+    # 6) objective: costs of the new tiles and the four-corner points
+    #    they can touch
+    obj_terms = [cfg.weights.get(key[0], 0) * v for key, v in X.items()]
+    if cfg.four_corner_penalty_weight is not None:
+        for p, touching in corners.items():
+            if not touching:
+                continue
+            n_fixed = len(fixed_corners[p])
+            c = model.NewBoolVar(f"C_{p[0]}_{p[1]}")
+            model.Add(sum(touching) + n_fixed == 4).OnlyEnforceIf(c)
+            model.Add(sum(touching) + n_fixed <= 3).OnlyEnforceIf(c.Not())
+            obj_terms.append(cfg.four_corner_penalty_weight * c)
+    model.Minimize(sum(obj_terms))
+
+    current = set(freed)
+    for key, v in X.items():
+        model.AddHint(v, key in current)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.num_search_workers = 1
+    solver.parameters.random_seed = seed
+    status = solver.Solve(model)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None
+    new = [key for key, v in X.items() if solver.Value(v)]
+    return freed, new, status == cp_model.OPTIMAL
+
+
+def _apply(placements, freed, new):
+    gone = set(freed)
+    return [p for p in placements if p not in gone] + new
+
+
+def solve_lns(width_cm: int, height_cm: int, cfg: TilingConfig,
+              initial=None, window: Optional[Tuple[int, int]] = None,
+              window_time: float = 1.0, processes: Optional[int] = None,
+              on_solution: Optional[Callable] = None) -> TilingResult:
+    """
+    Improve a tiling by LNS within cfg.max_time_in_seconds, in total.
+
+    initial is a valid list of placements to start from; by default the
+    flat model (multiscale if cfg says so) gets START_TIME_SHARE of the
+    time to find one, or longer until it has one; an OPTIMAL or failed
+    start is returned as is.
+    window is the (width, height) in grid cells of the first windows,
+    by default twice the longest tile; windows grow after a round
+    without improvement and shrink when their sub-models time out.
+    Every window gets at most window_time seconds on one of processes
+    pool workers (default cfg.num_search_workers; 1 runs in-process),
+    less when a round would otherwise overrun the time limit.
+    on_solution(placements, objective, bound) is called per improvement.
+    """
+    t0 = time.perf_counter()
+    deadline = t0 + cfg.max_time_in_seconds
+    G = cfg.grid_size
+    W, H = width_cm // G, height_cm // G
+    tile_cells = _tile_cells(cfg.formats, G, cfg.break_symmetries)
+    bound = None
+    if initial is None:
+        rejected = infeasible(width_cm, height_cm, cfg)
+        if rejected is not None:
+            return rejected
+        # the flat model searches until it has a solution and its share
+        # of the time is over, whichever comes last
+        model = TilingModel(width_cm, height_cm, cfg)
+        share_end = t0 + cfg.max_time_in_seconds * START_TIME_SHARE
+        found = threading.Event()
+
+        def on_start(placements, objective, bound):
+            found.set()
+            if time.perf_counter() >= share_end:
+                model.stop()
+
+        alarm = threading.Timer(share_end - time.perf_counter(),
+                                lambda: found.is_set() and model.stop())
+        alarm.start()
+        try:
+            start = model.solve(on_solution=on_start)
+        finally:
+            alarm.cancel()
+        if not start.found or start.status == "OPTIMAL":
+            return start
+        placements, bound = start.placements, start.best_bound
+        timings = dict(start.timings)
+    else:
+        placements = list(initial)
+        problems = violations(placements, W, H, tile_cells, cfg)
+        if problems:
+            raise ValueError(f"Initial tiling is not valid: {'; '.join(problems)}")
+        timings = {}
+    timer = _PhaseTimer(timings)
+    objective = _objective_value(placements, W, H, tile_cells, cfg)
+    trajectory = [(time.perf_counter() - t0, objective)]
+
+    longest = max(max(dims) for cells in tile_cells.values() for dims in cells)
+    min_w, min_h = window or (2 * longest, 2 * longest)
+    min_w, min_h = min(min_w, W), min(min_h, H)
+    ww, wh = min_w, min_h
+    processes = processes or cfg.num_search_workers
+    rnd = random.Random(cfg.random_seed)
+    rounds = windows = 0
+
+    pool = ProcessPoolExecutor(processes) if processes > 1 else None
+    try:
+        while True:
+            left = deadline - time.perf_counter()
+            if left <= 0.05:
+                break
+            # windows a window apart, at a random offset of the torus
+            x0, y0 = rnd.randrange(W), rnd.randrange(H)
+            xs = [x0 + a * 2 * ww for a in range(max(1, W // (2 * ww)))]
+            ys = [y0 + b * 2 * wh for b in range(max(1, H // (2 * wh)))]
+            spots = [(x, y) for x in xs for y in ys]
+            # windows run in batches of processes; the time left is split
+            # over the batches still to run, and none starts after the
+            # deadline
+            results = []
+            for b in range(0, len(spots), processes):
+                left = deadline - time.perf_counter()
+                if b and left <= 0:
+                    break
+                batches = -(-(len(spots) - b) // processes)
+                tasks = [(placements, (x, y, ww, wh), W, H, tile_cells, cfg,
+                          min(window_time, max(0.0, left) / batches),
+                          rnd.randrange(2 ** 31))
+                         for x, y in spots[b:b + processes]]
+                results += [r for r in (pool.map(_solve_window, tasks) if pool
+                                        else map(_solve_window, tasks)) if r]
+                windows += len(tasks)
+            rounds += 1
+
+            # best window first, then every other one that keeps it valid
+            scored = sorted(
+                (_objective_value(_apply(placements, freed, new), W, H, tile_cells, cfg),
+                 freed, new)
+                for freed, new, _ in results)
+            merged, merged_objective = placements, objective
+            for value, freed, new in scored:
+                if value >= objective:
+                    break
+                trial = _apply(merged, freed, new)
+                value = _objective_value(trial, W, H, tile_cells, cfg)
+                if value < merged_objective and \
+                        not violations(trial, W, H, tile_cells, cfg):
+                    merged, merged_objective = trial, value
+
+            if merged_objective < objective:
+                placements, objective = merged, merged_objective
+                trajectory.append((time.perf_counter() - t0, objective))
+                if on_solution is not None:
+                    on_solution(placements, objective, bound)
+            elif all(optimal for _, _, optimal in results):
+                # every window is locally optimal: look wider
+                ww, wh = min(W, ww + max(1, ww // 4)), min(H, wh + max(1, wh // 4))
+            if not all(optimal for _, _, optimal in results):
+                ww, wh = max(min_w, ww * 4 // 5), max(min_h, wh * 4 // 5)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    timer.lap("lns")
+
+    result = TilingResult(
+        status="OPTIMAL" if bound is not None and objective <= bound else "FEASIBLE",
+        placements=placements,
+        width_cm=width_cm,
+        height_cm=height_cm,
+        grid_size=G,
+        objective=objective,
+        best_bound=bound,
+        timings=timings,
+        stats={"rounds": rounds, "windows": windows,
+               "improvements": len(trajectory) - 1,
+               "window_width": ww, "window_height": wh},
+        trajectory=trajectory,
+    )
+    logger.info("%dx%d cm LNS: %s", width_cm, height_cm, result.summary(),
+                extra={"tiling_result": result})
+    return result
@@ -0,0 +1,296 @@
+"""
+Portfolio of differently configured solves, one process each.
+
+CP-SAT's own workers already diversify, but all of them see the same
+model, and a single unlucky seed or search strategy can cost the whole
+time limit. A portfolio runs several members side by side, each with its
+own seed and some other twist: symmetry breaking toggled, the corner
+indicators left out (costs only), or another branching strategy.
+
+Every improving solution of a member is sent back at once, so the best
+tiling found by any member (the incumbent) is always known. At the end
+of each round, rounds doubling in length, the members whose current
+solve is behind the incumbent are stopped and restarted with it as
+their hint; the leaders keep searching undisturbed. Restarts only begin
+once there is an incumbent. The portfolio stops at the first OPTIMAL of
+a member that optimizes the real objective, or when the time is up, and
+reports which member found the returned tiling.
+"""
+import dataclasses
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from core.precheck import infeasible
+from core.tiling import (TilingConfig, TilingModel, TilingResult,
+                         _objective_value, _tile_cells)
+
+logger = logging.getLogger(__name__)
+
+# share of the time limit given to the first round; every next one is
+# twice as long
+FIRST_ROUND_SHARE = 0.125
+
+
+@dataclass
+class PortfolioMember:
+    """A named set of TilingConfig field overrides."""
+    name: str
+    overrides: Dict[str, object] = field(default_factory=dict)
+
+
+def default_members(cfg: TilingConfig) -> List[PortfolioMember]:
+    """The default portfolio, most useful members first."""
+    seed = cfg.random_seed or 0
+    symmetry = not cfg.break_symmetries
+    members = [
+        PortfolioMember("default", {"random_seed": seed}),
+        PortfolioMember("symmetry-" + ("on" if symmetry else "off"),
+                        {"random_seed": seed + 1,
+                         "break_symmetries": symmetry,
+                         "break_dihedral_symmetries": symmetry}),
+        PortfolioMember("pseudo-cost",
+                        {"random_seed": seed + 2,
+                         "solver_parameters": {"search_branching": "PSEUDO_COST_SEARCH"}}),
+        PortfolioMember("lp", {"random_seed": seed + 3,
+                               "solver_parameters": {"linearization_level": 2}}),
+        PortfolioMember("seed", {"random_seed": seed + 4}),
+    ]
+    if cfg.four_corner_penalty_weight is not None:
+        # without the corner indicators: smaller model, fast feasible tilings
+        members.insert(2, PortfolioMember("costs-only", {
+            "random_seed": seed + 5, "four_corner_penalty_weight": None}))
+    return members
+
+
+def _same_objective(a: TilingConfig, b: TilingConfig) -> bool:
+    """Whether a and b minimize the same objective over the same tilings."""
+    return (a.weights == b.weights and a.min_counts == b.min_counts
+            and a.max_counts == b.max_counts
+            and a.four_corner_penalty_weight == b.four_corner_penalty_weight)
+
+
+def _upright_squares(placements, formats):
+    """
+    Orientation 0 for square formats, which have only that one with
+    break_symmetries.
+    """
+    return [(k, i, j, 0 if formats[k][0] == formats[k][1] else o)
+            for k, i, j, o in placements]
+
+
+_STOP = "stop"
+
+
+def _member_process(name, width_cm, height_cm, cfg, inbox, outbox):
+    """
+    Keeps one TilingModel and solves it for every (hint, seconds) task
+    from inbox until it gets None; a _STOP message ends the running
+    solve early. Sends ("solution", name, (placements, objective)) per
+    improving solution and ("result", name, TilingResult) per task, or
+    ("error", name, traceback).
+    """
+    def run(hint, seconds):
+        try:
+            result = model.solve(
+                dataclasses.replace(cfg, max_time_in_seconds=seconds), hint=hint,
+                on_solution=lambda placements, objective, bound:
+                    outbox.put(("solution", name, (placements, objective))))
+            outbox.put(("result", name, result))
+        except Exception:
+            outbox.put(("error", name, traceback.format_exc()))
+
+    try:
+        model = TilingModel(width_cm, height_cm, cfg)
+    except Exception:
+        outbox.put(("error", name, traceback.format_exc()))
+        return
+    task = inbox.get()
+    while task is not None:
+        if task == _STOP:
+            # the solve it was meant for has already ended
+            task = inbox.get()
+            continue
+        # a stop that came in as the previous solve was ending must not
+        # cut this one short
+        model._stop_requested = False
+        worker = threading.Thread(target=run, args=task)
+        worker.start()
+        task = _STOP
+        while worker.is_alive() and task == _STOP:
+            try:
+                task = inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if task == _STOP:
+                model.stop()
+        # the next task only comes after the result was received, so by
+        # then the worker is finishing anyway
+        worker.join()
+        if task == _STOP:
+            task = inbox.get()
+
+
+def solve_portfolio(width_cm: int, height_cm: int, cfg: TilingConfig,
+                    members: Optional[List[PortfolioMember]] = None,
+                    processes: Optional[int] = None,
+                    on_solution: Optional[Callable] = None) -> TilingResult:
+    """
+    Solve with a portfolio within cfg.max_time_in_seconds. members
+    defaults to default_members(cfg); only the first processes of them
+    are run (default: one per CPU core), and cfg.num_search_workers is
+    split between them. on_solution(placements, objective, bound) is
+    called for every improvement of the shared incumbent.
+
+    The result's stats name the "winner" (the member whose tiling is
+    returned), its "winner_overrides", the "rounds" run and, per member,
+    the best objective it reached ("members"). Objectives of members that
+    optimize something else (costs-only) are re-evaluated with cfg.
+    """
+    rejected = infeasible(width_cm, height_cm, cfg)
+    if rejected is not None:
+        return rejected
+    t0 = time.perf_counter()
+    deadline = t0 + cfg.max_time_in_seconds
+    G = cfg.grid_size
+    W, H = width_cm // G, height_cm // G
+    tile_cells = _tile_cells(cfg.formats, G, cfg.break_symmetries)
+
+    members = members or default_members(cfg)
+    processes = processes or os.cpu_count() or 1
+    members = members[:max(1, processes)]
+    workers = max(1, cfg.num_search_workers // len(members))
+    configs = {m.name: dataclasses.replace(cfg, num_search_workers=workers, **m.overrides)
+               for m in members}
+    exact = {name: _same_objective(c, cfg) for name, c in configs.items()}
+
+    outbox = multiprocessing.Queue()
+    inboxes, procs = {}, {}
+    for name, member_cfg in configs.items():
+        inboxes[name] = multiprocessing.Queue()
+        procs[name] = multiprocessing.Process(
+            target=_member_process, daemon=True,
+            args=(name, width_cm, height_cm, member_cfg, inboxes[name], outbox))
+        procs[name].start()
+
+    best = winner = bound = None
+    best_objective = float("inf")
+    reached = {name: None for name in configs}   # best objective per member
+    current = {}          # objective of the running solve per member
+    trajectory = []
+
+    def send(name):
+        hint = best
+        if hint is not None and configs[name].break_symmetries:
+            hint = _upright_squares(hint, cfg.formats)
+        inboxes[name].put((hint, max(0.0, deadline - time.perf_counter())))
+        current[name] = None
+        running.add(name)
+
+    def offer(name, placements, objective):
+        nonlocal best, best_objective, winner
+        if not exact[name]:
+            objective = _objective_value(
+                _upright_squares(placements, cfg.formats) if cfg.break_symmetries
+                else placements, W, H, tile_cells, cfg)
+        if current[name] is None or objective < current[name]:
+            current[name] = objective
+        if reached[name] is None or objective < reached[name]:
+            reached[name] = objective
+        if objective < best_objective:
+            best, best_objective, winner = placements, objective, name
+            trajectory.append((time.perf_counter() - t0, objective))
+            if on_solution is not None:
+                on_solution(best, best_objective, bound)
+
+    status = "UNKNOWN"
+    running, restarting = set(), set()
+    rounds = 1
+    round_time = cfg.max_time_in_seconds * FIRST_ROUND_SHARE
+    round_end = t0 + round_time
+    try:
+        for name in configs:
+            send(name)
+        while running:
+            now = time.perf_counter()
+            if best is not None and now >= round_end:
+                # restart every member behind the incumbent from it;
+                # the leaders keep searching undisturbed
+                for name in running - restarting:
+                    if current[name] is None or current[name] > best_objective:
+                        inboxes[name].put(_STOP)
+                        restarting.add(name)
+                rounds += 1
+                round_time *= 2
+                round_end = now + round_time
+            try:
+                kind, name, payload = outbox.get(timeout=0.1)
+            except queue.Empty:
+                dead = [n for n in running if not procs[n].is_alive()]
+                if dead:
+                    raise RuntimeError(f"Portfolio member {dead[0]} died")
+                continue
+            if kind == "error":
+                raise RuntimeError(f"Portfolio member {name} failed:\n{payload}")
+            if kind == "solution":
+                offer(name, *payload)
+                continue
+
+            result = payload
+            running.discard(name)
+            if result.status == "INFEASIBLE":
+                # symmetry breaking and the objective don't remove
+                # tilings, so every member has the same feasible set
+                status, winner = "INFEASIBLE", name
+                break
+            if exact[name] and result.best_bound is not None:
+                bound = result.best_bound if bound is None else max(bound, result.best_bound)
+            if result.found:
+                offer(name, result.placements, result.objective)
+            if result.status == "OPTIMAL" and exact[name]:
+                status = "OPTIMAL"
+                break
+            if bound is not None and best_objective <= bound:
+                status = "OPTIMAL"
+                break
+            # a member optimal for its own objective has nothing more to give
+            if name in restarting and result.status != "OPTIMAL" \
+                    and deadline - time.perf_counter() > 0.05:
+                send(name)
+            restarting.discard(name)
+        if status == "UNKNOWN" and best is not None:
+            status = "FEASIBLE"
+    finally:
+        for name, proc in procs.items():
+            proc.terminate()
+        for proc in procs.values():
+            proc.join()
+
+    if best is not None and cfg.break_symmetries:
+        best = _upright_squares(best, cfg.formats)
+    result = TilingResult(
+        status=status,
+        placements=best if status != "INFEASIBLE" else None,
+        width_cm=width_cm,
+        height_cm=height_cm,
+        grid_size=G,
+        objective=best_objective if best is not None else None,
+        best_bound=bound,
+        timings={"solve": time.perf_counter() - t0},
+        stats={"winner": winner,
+               "winner_overrides": next((m.overrides for m in members
+                                         if m.name == winner), None),
+               "rounds": rounds,
+               "members": reached},
+        trajectory=trajectory,
+    )
+    logger.info("%dx%d cm portfolio: %s, won by %s", width_cm, height_cm,
+                result.summary(), winner, extra={"tiling_result": result})
+    return result
@@ -0,0 +1,147 @@
+"""
+Analytical infeasibility checks, run before a model is built.
+
+Most configurations that cannot be tiled fail for a simple counting
+reason: the floor is not on the grid, the count bounds contradict each
+other or the floor area, or no mix of tile lengths adds up to the floor
+width or height. CP-SAT would find each of these eventually, but only
+after building the full model, and on big floors it may instead use up
+the whole time limit. The checks here take milliseconds and name what
+is wrong.
+
+They are necessary conditions only: a floor that passes can still turn
+out infeasible in the solver.
+"""
+import time
+
+from typing import Dict, List, Optional, Tuple
+
+from core.tiling import TilingConfig, TilingResult
+
+
+def _sums(total: int, parts: List[int]) -> List[bool]:
+    """Which of 0..total are sums of parts, each used any number of times."""
+    ok = [True] + [False] * total
+    for n in range(1, total + 1):
+        ok[n] = any(p <= n and ok[n - p] for p in parts)
+    return ok
+
+
+def _area_reachable(area: int, items: List[Tuple[int, int, int]]) -> bool:
+    """
+    Whether area = sum of n*a over items (a, lo, hi) with lo <= n <= hi.
+    Bounded knapsack over a bitset: bit s is set if s is reachable, and the
+    hi - lo optional copies are added in chunks of 1, 2, 4, ...
+    """
+    mask = (1 << (area + 1)) - 1
+    reach = 1
+    for a, lo, hi in items:
+        reach = (reach << (lo * a)) & mask
+        extra, chunk = hi - lo, 1
+        while extra > 0 and reach:
+            step = min(chunk, extra)
+            reach |= (reach << (step * a)) & mask
+            extra -= step
+            chunk *= 2
+    return bool(reach >> area & 1)
+
+
+def precheck(width_cm: int, height_cm: int, cfg: TilingConfig) -> Optional[str]:
+    """Why the floor cannot be tiled with cfg, or None if no check fails."""
+    G = cfg.grid_size
+    # 1) grid
+    if width_cm <= 0 or height_cm <= 0:
+        return f"Floor size {width_cm}×{height_cm} cm must be positive"
+    for name, size in (("width", width_cm), ("height", height_cm)):
+        if size % G:
+            return f"Floor {name} {size} cm is not a multiple of the grid size {G} cm"
+    for k, (w, h) in cfg.formats.items():
+        if w % G or h % G:
+            return f"Tile {k} ({w}×{h} cm) is not a multiple of the grid size {G} cm"
+    W, H = width_cm // G, height_cm // G
+
+    # 2) count bounds
+    bounds: Dict[int, Tuple[int, int]] = {}
+    for k in cfg.formats:
+        lo = cfg.min_counts.get(k, 0)
+        hi = cfg.max_counts.get(k)
+        if hi is not None and lo > hi:
+            return f"Tile {k}: min count {lo} exceeds max count {hi}"
+        bounds[k] = (lo, hi)
+
+    # 3) usable orientations. As in TilingModel, a tile longer than the
+    #    torus wraps onto itself and covers the whole row or column once,
+    #    so its size is clipped to the floor; a format with max count 0 is
+    #    not used at all
+    turns = {k: [] if bounds[k][1] == 0 else sorted({(w // G, h // G), (h // G, w // G)})
+             for k, (w, h) in cfg.formats.items()}
+    fits = {k: sorted({(min(a, W), min(b, H)) for a, b in turns[k]}) for k in turns}
+    oriented = [o for k in fits for o in fits[k]]
+    if not oriented:
+        return "Every tile format has max count 0"
+
+    # 4) area; the clipped orientations of a format may differ in area
+    cell_area = G * G
+    least = {k: min(a * b for a, b in fits[k]) for k in fits if fits[k]}
+    min_area = sum(bounds[k][0] * least[k] for k in least) * cell_area
+    if min_area > width_cm * height_cm:
+        return (f"Min counts cover {min_area} cm², more than the floor's "
+                f"{width_cm * height_cm} cm²")
+    items = []
+    for k in least:
+        lo, hi = bounds[k]
+        areas = sorted({a * b for a, b in fits[k]})
+        for a in areas:
+            cap = min(hi if hi is not None else W * H, W * H // a)
+            # with two areas the count bounds hold for their sum only, so
+            # both are relaxed to 0..max
+            items.append((a, lo if len(areas) == 1 else 0, cap))
+    if not _area_reachable(W * H, items):
+        return (f"No tile counts within the bounds add up to the floor area "
+                f"{width_cm * height_cm} cm²")
+
+    # 5) every row of cells is covered by tiles side by side, so the
+    #    floor width is a sum of tile widths, and likewise for columns
+    widths = _sums(W, sorted({a for a, _ in oriented}))
+    heights = _sums(H, sorted({b for _, b in oriented}))
+    if not widths[W]:
+        return f"No row of tiles adds up to the floor width {width_cm} cm"
+    if not heights[H]:
+        return f"No column of tiles adds up to the floor height {height_cm} cm"
+    for k, (w, h) in cfg.formats.items():
+        if bounds[k][0] > 0 and not any(widths[W - a] and heights[H - b]
+                                        for a, b in fits[k]):
+            return (f"Tile {k} ({w}×{h} cm) cannot be placed: the rest of its "
+                    f"row or column cannot be filled")
+
+    # 6) a straight line is avoided only by tiles crossing it, which takes
+    #    a tile longer than one cell after clipping; wrapping around the
+    #    edge takes one longer than one cell
+    if cfg.enforce_no_straight_lines or cfg.enforce_wrap:
+        if cfg.enforce_no_straight_lines:
+            rule, spans = "no straight lines", oriented
+        else:
+            rule, spans = "wrap", [o for k in turns for o in turns[k]]
+        if not any(a > 1 for a, _ in spans):
+            return (f"No tile spans more than one grid cell across, so the "
+                    f"{rule} rule cannot hold on vertical lines")
+        if not any(b > 1 for _, b in spans):
+            return (f"No tile spans more than one grid cell down, so the "
+                    f"{rule} rule cannot hold on horizontal lines")
+    return None
+
+
+def infeasible(width_cm: int, height_cm: int, cfg: TilingConfig) -> Optional[TilingResult]:
+    """
+    INFEASIBLE TilingResult carrying the reason if precheck rejects the
+    floor, else None.
+    """
+    t0 = time.perf_counter()
+    reason = precheck(width_cm, height_cm, cfg)
+    if reason is None:
+        return None
+    return TilingResult(status="INFEASIBLE", placements=None,
+                        width_cm=width_cm, height_cm=height_cm,
+                        grid_size=cfg.grid_size,
+                        timings={"precheck": time.perf_counter() - t0},
+                        reason=reason)
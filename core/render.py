@@ -0,0 +1,146 @@
+"""
+Raster renderer for tilings, built on NumPy and Pillow.
+
+The W×H period is rasterized once: a cell→placement grid is scaled up to
+pixels, tile borders come from comparing it with its shifted copies and
+labels are stamped into a mask. Larger views (3×3 preview, or any N×M)
+are then plain array tiling of that period, and the weaker colours of
+the neighbouring blocks are a transform of the colour table, not of the
+pixels.
+"""
+import random
+
+import numpy as np
+
+from typing import Dict, Tuple
+from PIL import Image, ImageDraw, ImageFont
+
+from core.tiling import _tile_cells
+
+# rough pixel budget of the longer side of a default preview
+DEFAULT_SIZE = 1800
+
+
+def tile_colors(formats: Dict[int, Tuple[int, int]]):
+    """
+    (central, neighbor) colour tables, uint8 arrays of shape (K+1, 3);
+    row 0 is the background, row n the n-th format in sorted id order.
+    Colours are seeded by format id, so redraws of the same catalogue
+    keep their colours.
+    """
+    ids = sorted(formats)
+    base = np.ones((len(ids) + 1, 3))
+    for n, k in enumerate(ids, start=1):
+        rnd = random.Random(k)
+        base[n] = (rnd.uniform(0.8, 1.0), rnd.random(), rnd.random())
+    return _blend(base, 0.8), _blend(neighbor_tint(base), 0.3)
+
+
+def neighbor_tint(rgb):
+    """Weak-red variant of colours in [0, 1], used for neighbouring blocks."""
+    tinted = np.array(rgb, dtype=float)
+    tinted[1:, 0] *= 0.1
+    return tinted
+
+
+def _blend(rgb, alpha):
+    """Colours drawn with the given alpha over a white background."""
+    return np.round(255 * (alpha * rgb + (1 - alpha))).astype(np.uint8)
+
+
+def owner_grid(placements, W, H, tile_cells):
+    """
+    (H, W) arrays: index of the placement covering each cell (-1 for a
+    gap) and its format's row in the colour table.
+    """
+    owner = np.full((H, W), -1, dtype=np.int32)
+    fmt = np.zeros((H, W), dtype=np.int16)
+    rows = {k: n for n, k in enumerate(sorted(tile_cells), start=1)}
+    for p, (k, i, j, o) in enumerate(placements):
+        wc, hc = tile_cells[k][o]
+        xs = (i + np.arange(min(wc, W))) % W
+        ys = (j + np.arange(min(hc, H))) % H
+        owner[np.ix_(ys, xs)] = p
+        fmt[np.ix_(ys, xs)] = rows[k]
+    return owner, fmt
+
+
+def _load_font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 only has the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def render_period(placements, W, H, tile_cells, cell_px: int,
+                  formats: Dict[int, Tuple[int, int]]):
+    """
+    Rasterize one period. Returns (central, neighbor) RGB arrays of
+    shape (H*cell_px, W*cell_px, 3), borders and labels included.
+    """
+    owner, fmt = owner_grid(placements, W, H, tile_cells)
+    central_lut, neighbor_lut = tile_colors(formats)
+
+    fmt_px = np.repeat(np.repeat(fmt, cell_px, axis=0), cell_px, axis=1)
+    owner_px = np.repeat(np.repeat(owner, cell_px, axis=0), cell_px, axis=1)
+
+    # a pixel is on a border if the next pixel right / down (on the torus)
+    # belongs to another placement; thicken the line for big cells
+    border = (owner_px != np.roll(owner_px, -1, axis=1)) | \
+             (owner_px != np.roll(owner_px, -1, axis=0))
+    for _ in range(max(1, cell_px // 24) - 1):
+        border |= np.roll(border, 1, axis=0) | np.roll(border, 1, axis=1)
+
+    ink = border
+    font_size = int(min(48, cell_px * 0.6))
+    if font_size >= 6:
+        ink = ink | _label_mask(placements, W, H, tile_cells, cell_px, font_size)
+
+    central = central_lut[fmt_px]
+    neighbor = neighbor_lut[fmt_px]
+    central[ink] = 0
+    neighbor[ink] = 0
+    return central, neighbor
+
+
+def _label_mask(placements, W, H, tile_cells, cell_px, font_size):
+    """Boolean mask of the format id printed at the centre of every tile."""
+    pw, ph = W * cell_px, H * cell_px
+    mask = Image.new("1", (pw, ph), 0)
+    draw = ImageDraw.Draw(mask)
+    font = _load_font(font_size)
+    for k, i, j, o in placements:
+        wc, hc = tile_cells[k][o]
+        left, top, right, bottom = draw.textbbox((0, 0), str(k), font=font)
+        x = ((i + wc / 2) * cell_px - (left + right) / 2) % pw
+        y = ((j + hc / 2) * cell_px - (top + bottom) / 2) % ph
+        # also draw the copies shifted by one period, so labels of tiles
+        # wrapping over the edge stay whole once the period is tiled
+        for dx in (0, -pw):
+            for dy in (0, -ph):
+                draw.text((x + dx, y + dy), str(k), fill=1, font=font)
+    return np.array(mask, dtype=bool)
+
+
+def render_tiling(placements, width_cm: int, height_cm: int, G: int,
+                  formats: Dict[int, Tuple[int, int]],
+                  repeat: Tuple[int, int] = (3, 3),
+                  cell_px: int = None, size: int = DEFAULT_SIZE) -> Image.Image:
+    """
+    Image of repeat=(columns, rows) copies of the period, the middle one
+    in strong colours. cell_px is the pixel size of one grid cell; by
+    default it is chosen so the longer side of the image is about size.
+    """
+    W, H = width_cm // G, height_cm // G
+    cols, rows = repeat
+    if cell_px is None:
+        cell_px = max(1, size // max(cols * W, rows * H))
+    tile_cells = _tile_cells(formats, G)
+    central, neighbor = render_period(placements, W, H, tile_cells, cell_px, formats)
+
+    ph, pw = central.shape[:2]
+    out = np.tile(neighbor, (rows, cols, 1))
+    r0, c0 = rows // 2, cols // 2
+    out[r0 * ph:(r0 + 1) * ph, c0 * pw:(c0 + 1) * pw] = central
+    return Image.fromarray(out, "RGB")
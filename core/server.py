@@ -0,0 +1,428 @@
+"""
+Local job server, so several GUIs share one pool of solver processes.
+
+    python -m core.server [--port 8765] [--cores N] [--parallel N] [--queue 32]
+
+Clients POST a floor and its TilingConfig and poll the job. The server
+keeps a bounded queue in front of a process pool split like the batch
+mode (core.cli.split_cores), and the search workers of a job are set by
+the server, not the client. A job identical to one still queued or
+running (same core.cache.config_key) with at least the same time limit
+is not solved twice: the submitter gets that job back. Every worker
+goes through the shared SolutionCache, so a room solved once is
+answered from the cache afterwards.
+
+    POST /jobs       {"width", "height", "config": {TilingConfig fields}}
+                     -> the job; 503 when the queue is full
+    GET  /jobs/<id>  state (queued, running, done, failed), the incumbent
+                     tiling while running, the TilingResult when done
+    GET  /status     queue length, running jobs, pool size
+
+TilingClient talks to the server over HTTP. LocalClient is an in-process
+stand-in that passes the same requests straight to a JobQueue, with the
+jobs run in threads.
+"""
+import argparse
+import dataclasses
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+from core.cache import DEFAULT_CACHE_PATH, SolutionCache, cached_solve, config_key
+from core.precheck import infeasible
+from core.tiling import TilingConfig, TilingResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+
+
+class QueueFull(Exception):
+    pass
+
+
+class ServerError(RuntimeError):
+    pass
+
+
+# progress queue of a pool process, set by _init_worker
+_progress = None
+
+
+def _init_worker(progress):
+    global _progress
+    _progress = progress
+
+
+def _run_job(job_id: str, width_cm: int, height_cm: int, cfg: TilingConfig,
+             cache_path: Optional[str], progress=None) -> TilingResult:
+    """Solve one job in a pool worker, reporting ("started" | "solution", ...)."""
+    progress = progress or _progress
+    progress.put((job_id, "started", None))
+    cache = SolutionCache(cache_path) if cache_path else None
+    return cached_solve(
+        width_cm, height_cm, cfg, cache,
+        on_solution=lambda placements, objective, bound:
+            progress.put((job_id, "solution", (placements, objective, bound))))
+
+
+def result_to_json(result: TilingResult) -> dict:
+    return dataclasses.asdict(result)
+
+
+def result_from_json(data: dict) -> TilingResult:
+    data = dict(data)
+    if data["placements"] is not None:
+        data["placements"] = [tuple(p) for p in data["placements"]]
+    data["trajectory"] = [tuple(t) for t in data["trajectory"]]
+    return TilingResult(**data)
+
+
+@dataclasses.dataclass
+class _Job:
+    id: str
+    key: str
+    width: int
+    height: int
+    time_limit: float
+    state: str = "queued"
+    submitted: float = dataclasses.field(default_factory=time.time)
+    incumbent: Optional[dict] = None
+    result: Optional[TilingResult] = None
+    error: Optional[str] = None
+
+    def view(self) -> dict:
+        return {"id": self.id, "state": self.state,
+                "width": self.width, "height": self.height,
+                "submitted": self.submitted, "incumbent": self.incumbent,
+                "result": result_to_json(self.result) if self.result else None,
+                "error": self.error}
+
+
+class JobQueue:
+    """
+    Jobs, their pool and the result store, without HTTP. processes and
+    workers default to core.cli.split_cores over the host's cores. At
+    most max_queued jobs wait for a free process; the last keep_finished
+    finished jobs stay queryable. in_process runs jobs in threads
+    instead of processes.
+    """
+
+    def __init__(self, cores: Optional[int] = None, processes: Optional[int] = None,
+                 workers: Optional[int] = None, max_queued: int = 32,
+                 cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+                 keep_finished: int = 256, in_process: bool = False):
+        from core.cli import split_cores
+        cores = cores or os.cpu_count() or 1
+        self.processes, self.workers = split_cores(cores, cores, processes)
+        self.workers = workers or self.workers
+        self.max_queued = max_queued
+        self.cache_path = cache_path
+        self.keep_finished = keep_finished
+        if cache_path:
+            SolutionCache(cache_path)  # create the table before the workers race to
+        self._jobs: "OrderedDict[str, _Job]" = OrderedDict()
+        # config key -> id of the queued / running job with the longest time limit
+        self._inflight: Dict[str, str] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._in_process = in_process
+        if in_process:
+            self._progress = queue.Queue()
+            self._pool = ThreadPoolExecutor(max_workers=self.processes)
+        else:
+            # spawn: the server would otherwise fork from a process full of threads
+            context = multiprocessing.get_context("spawn")
+            self._progress = context.Queue()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes, mp_context=context,
+                initializer=_init_worker, initargs=(self._progress,))
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+
+    def submit(self, width_cm: int, height_cm: int, cfg: TilingConfig) -> dict:
+        """
+        The new job, or the queued / running one with the same problem,
+        unless that one has a shorter time limit than cfg.
+        """
+        key = config_key(width_cm, height_cm, cfg)
+        # a floor rejected by precheck is answered at once, without a process
+        rejected = infeasible(width_cm, height_cm, cfg)
+        with self._lock:
+            running = self._jobs.get(self._inflight.get(key))
+            if running is not None and running.time_limit >= cfg.max_time_in_seconds:
+                return dict(running.view(), duplicate=True)
+            if rejected is None and sum(job.state == "queued"
+                                        for job in self._jobs.values()) >= self.max_queued:
+                raise QueueFull(f"{self.max_queued} jobs already queued")
+            job = _Job(f"{next(self._ids)}-{key[:12]}", key, width_cm, height_cm,
+                       cfg.max_time_in_seconds)
+            self._jobs[job.id] = job
+            if rejected is not None:
+                job.state, job.result = "done", rejected
+                self._trim()
+                return job.view()
+            self._inflight[key] = job.id
+
+        cfg = dataclasses.replace(cfg, num_search_workers=self.workers)
+        args = (job.id, width_cm, height_cm, cfg, self.cache_path)
+        if self._in_process:
+            args += (self._progress,)
+        future = self._pool.submit(_run_job, *args)
+        future.add_done_callback(lambda f: self._finish(job, f))
+        logger.info("job %s queued: %dx%d cm", job.id, width_cm, height_cm)
+        return job.view()
+
+    def job(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.view() if job else None
+
+    def status(self) -> dict:
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        return {"queued": states.count("queued"), "running": states.count("running"),
+                "finished": states.count("done") + states.count("failed"),
+                "processes": self.processes, "workers": self.workers,
+                "max_queued": self.max_queued}
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._progress.put(None)
+        self._listener.join()
+
+    def _listen(self):
+        while True:
+            message = self._progress.get()
+            if message is None:
+                return
+            job_id, kind, payload = message
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job.state in ("done", "failed"):
+                    continue
+                job.state = "running"
+                if kind == "solution":
+                    placements, objective, bound = payload
+                    job.incumbent = {"placements": [list(p) for p in placements],
+                                     "objective": objective, "best_bound": bound}
+
+    def _finish(self, job: _Job, future):
+        with self._lock:
+            if self._inflight.get(job.key) == job.id:
+                del self._inflight[job.key]
+            if future.cancelled():
+                job.state, job.error = "failed", "cancelled"
+            elif future.exception() is not None:
+                job.state, job.error = "failed", repr(future.exception())
+            else:
+                job.state, job.result = "done", future.result()
+            self._trim()
+        logger.info("job %s %s", job.id,
+                    job.result.summary() if job.result else job.error)
+
+    def _trim(self):
+        finished = [j.id for j in self._jobs.values() if j.state in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+
+def route(jobs: JobQueue, method: str, path: str, body: Optional[dict]):
+    """(HTTP status, JSON reply) of one request."""
+    from core.cli import make_config
+    parts = [p for p in path.split("?")[0].split("/") if p]
+    if method == "POST" and parts == ["jobs"]:
+        try:
+            cfg = make_config(body["config"])
+            width, height = int(body["width"]), int(body["height"])
+        except (KeyError, TypeError, ValueError) as e:
+            return 400, {"error": f"bad job: {e}"}
+        try:
+            return 200, jobs.submit(width, height, cfg)
+        except QueueFull as e:
+            return 503, {"error": str(e)}
+    if method == "GET" and len(parts) == 2 and parts[0] == "jobs":
+        job = jobs.job(parts[1])
+        return (200, job) if job else (404, {"error": f"no job {parts[1]}"})
+    if method == "GET" and parts == ["status"]:
+        return 200, jobs.status()
+    return 404, {"error": f"no route {method} {path}"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def _reply(self, method):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"null") if length else None
+        except ValueError:
+            code, reply = 400, {"error": "body is not JSON"}
+        else:
+            try:
+                code, reply = route(self.server.jobs, method, self.path, body)
+            except Exception as e:
+                logger.exception("%s %s failed", method, self.path)
+                code, reply = 500, {"error": repr(e)}
+        data = json.dumps(reply).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._reply("GET")
+
+    def do_POST(self):
+        self._reply("POST")
+
+    def log_message(self, format, *args):
+        logger.debug("%s " + format, self.address_string(), *args)
+
+
+class TilingServer(ThreadingHTTPServer):
+    """HTTP front of a JobQueue; port 0 picks a free port."""
+    daemon_threads = True
+
+    def __init__(self, jobs: JobQueue, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+        super().__init__((host, port), _Handler)
+        self.jobs = jobs
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class TilingClient:
+    """Submits floors to a server and follows their jobs; url may omit http://."""
+
+    def __init__(self, url: str = f"http://127.0.0.1:{DEFAULT_PORT}", timeout: float = 10):
+        self.url = url.rstrip("/") if "://" in url else "http://" + url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, body: Optional[dict] = None) -> dict:
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as reply:
+                return json.loads(reply.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read())["error"]
+            except (ValueError, KeyError):
+                message = str(e)
+            raise ServerError(message) from None
+
+    def submit(self, width_cm: int, height_cm: int, cfg: TilingConfig) -> dict:
+        return self._request("POST", "/jobs", {"width": width_cm, "height": height_cm,
+                                               "config": dataclasses.asdict(cfg)})
+
+    def job(self, job_id: str) -> dict:
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def status(self) -> dict:
+        return self._request("GET", "/status")
+
+    def solve(self, width_cm: int, height_cm: int, cfg: TilingConfig,
+              on_solution: Optional[Callable] = None,
+              stop: Optional[threading.Event] = None,
+              poll_interval: float = 0.5) -> TilingResult:
+        """
+        Submit and poll until the job is done. on_solution(placements,
+        objective, bound) is called for every new incumbent. When stop is
+        set, the incumbent so far is returned (FEASIBLE, or UNKNOWN
+        without one); the job itself keeps running for other clients.
+        """
+        job = self.submit(width_cm, height_cm, cfg)
+        seen = None
+        while True:
+            incumbent = job["incumbent"]
+            if incumbent and on_solution is not None and incumbent["objective"] != seen:
+                seen = incumbent["objective"]
+                on_solution([tuple(p) for p in incumbent["placements"]],
+                            incumbent["objective"], incumbent["best_bound"])
+            if job["state"] == "done":
+                return result_from_json(job["result"])
+            if job["state"] == "failed":
+                raise ServerError(f"job {job['id']} failed: {job['error']}")
+            if stop is not None and stop.wait(poll_interval):
+                return TilingResult(
+                    status="FEASIBLE" if incumbent else "UNKNOWN",
+                    placements=[tuple(p) for p in incumbent["placements"]] if incumbent else None,
+                    width_cm=width_cm, height_cm=height_cm, grid_size=cfg.grid_size,
+                    objective=incumbent["objective"] if incumbent else None,
+                    best_bound=incumbent["best_bound"] if incumbent else None)
+            if stop is None:
+                time.sleep(poll_interval)
+            job = self.job(job["id"])
+
+
+class LocalClient(TilingClient):
+    """
+    In-process stand-in for a server: the client's requests go through
+    the server's routing and JSON round trip, without sockets. jobs
+    defaults to a JobQueue that runs its jobs in threads, uncached.
+    """
+
+    def __init__(self, jobs: Optional[JobQueue] = None):
+        super().__init__(url="local:")
+        self.jobs = jobs or JobQueue(cores=1, cache_path=None, in_process=True)
+
+    def _request(self, method: str, path: str, body: Optional[dict] = None) -> dict:
+        body = json.loads(json.dumps(body)) if body is not None else None
+        code, reply = route(self.jobs, method, path, body)
+        if code != 200:
+            raise ServerError(reply["error"])
+        return json.loads(json.dumps(reply))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.server",
+                                     description="Serve torus tiling jobs over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cores", type=int, default=os.cpu_count() or 1,
+                        help="CPU cores to use in total (default: all)")
+    parser.add_argument("--parallel", type=int,
+                        help="jobs solved at the same time (default: cores // 4)")
+    parser.add_argument("--workers", type=int,
+                        help="search workers per job (default: cores // parallel)")
+    parser.add_argument("--queue", type=int, default=32,
+                        help="jobs waiting for a process before 503 (default: %(default)s)")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH,
+                        help="SQLite solution cache (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    jobs = JobQueue(cores=args.cores, processes=args.parallel, workers=args.workers,
+                    max_queued=args.queue, cache_path=None if args.no_cache else args.cache)
+    server = TilingServer(jobs, args.host, args.port)
+    print(f"serving on {server.url}: {jobs.processes} processes x "
+          f"{jobs.workers} workers", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        jobs.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Array-backed tiling solutions.
+
+A solve returns placements as a list of (k, i, j, o) tuples, which has
+to be rescanned for every "which tile covers this cell?" question.
+TilingSolution keeps them as a NumPy structured array next to an (H, W)
+grid of placement rows, laid out like core.render.owner_grid. Cell
+lookups and per-format counts are then array reads, and validate()
+re-checks a tiling with whole-array operations.
+
+Solutions are saved without pickling. A .npz path gives one file. Any
+other path gives a directory of .npy files, which load() can memory-map,
+so large solutions in an archive are opened without being read.
+"""
+import os
+
+import numpy as np
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from core.tiling import TilingConfig, TilingResult
+
+PLACEMENT_DTYPE = np.dtype([("k", np.int32), ("i", np.int32),
+                            ("j", np.int32), ("o", np.int8)])
+
+_ARRAYS = ("placements", "grid", "size", "formats")
+
+
+@dataclass
+class TilingSolution:
+    """
+    placements: PLACEMENT_DTYPE array, one row per tile. grid: (H, W)
+    int32 array, the placements row covering each cell (-1 for a gap).
+    size: [width_cm, height_cm, grid_size]. formats: (K, 3) array of
+    [id, width_cm, height_cm] rows.
+    """
+    placements: np.ndarray
+    grid: np.ndarray
+    size: np.ndarray
+    formats: np.ndarray
+
+    @classmethod
+    def from_placements(cls, placements, width_cm: int, height_cm: int, G: int,
+                        formats: Dict[int, Tuple[int, int]]) -> "TilingSolution":
+        table = np.array([(k, w, h) for k, (w, h) in sorted(formats.items())],
+                         dtype=np.int32).reshape(-1, 3)
+        size = np.array([width_cm, height_cm, G], dtype=np.int32)
+        array = np.array([tuple(p) for p in placements], dtype=PLACEMENT_DTYPE)
+        solution = cls(array, np.empty((0, 0), dtype=np.int32), size, table)
+        solution.grid = solution._grid()[0]
+        return solution
+
+    @classmethod
+    def from_result(cls, result: TilingResult,
+                    formats: Dict[int, Tuple[int, int]]) -> Optional["TilingSolution"]:
+        """The result's tiling, or None if it has none."""
+        if not result.found:
+            return None
+        return cls.from_placements(result.placements, result.width_cm,
+                                   result.height_cm, result.grid_size, formats)
+
+    @property
+    def W(self) -> int:
+        return int(self.size[0] // self.size[2])
+
+    @property
+    def H(self) -> int:
+        return int(self.size[1] // self.size[2])
+
+    def to_placements(self) -> List[Tuple[int, int, int, int]]:
+        return [tuple(int(v) for v in p) for p in self.placements]
+
+    def _known(self):
+        """Which placements have a format id listed in formats."""
+        return np.isin(self.placements["k"], self.formats[:, 0])
+
+    def _dims(self):
+        """
+        Width and height in grid cells of every placement; 0×0 for a
+        format id missing from formats, so that it covers no cells.
+        """
+        G = self.size[2]
+        table = np.vstack([self.formats, np.zeros((1, 3), dtype=self.formats.dtype)])
+        rows = np.searchsorted(self.formats[:, 0], self.placements["k"])
+        rows = np.where(self._known(), rows, len(self.formats))
+        w, h = table[rows, 1] // G, table[rows, 2] // G
+        turned = self.placements["o"] == 1
+        return np.where(turned, h, w), np.where(turned, w, h)
+
+    def _cells(self):
+        """
+        (placement row, x, y) of every covered cell, one entry per cover.
+        As in TilingModel, a tile longer than the torus wraps onto itself
+        and covers each cell of its row or column once.
+        """
+        wc, hc = self._dims()
+        wc, hc = np.minimum(wc, self.W), np.minimum(hc, self.H)
+        area = wc * hc
+        rows = np.repeat(np.arange(len(self.placements)), area)
+        # position of each cell inside its tile, column by column
+        local = np.arange(area.sum()) - np.repeat(np.cumsum(area) - area, area)
+        x = (self.placements["i"][rows] + local // hc[rows]) % self.W
+        y = (self.placements["j"][rows] + local % hc[rows]) % self.H
+        return rows, x, y
+
+    def _grid(self):
+        """(grid, cover count per cell), both (H, W)."""
+        rows, x, y = self._cells()
+        grid = np.full((self.H, self.W), -1, dtype=np.int32)
+        grid[y, x] = rows
+        cover = np.zeros((self.H, self.W), dtype=np.int32)
+        np.add.at(cover, (y, x), 1)
+        return grid, cover
+
+    def tile_at(self, x: int, y: int) -> Optional[Tuple[int, int, int, int]]:
+        """Placement covering cell (x, y), wrapped on the torus."""
+        row = self.grid[y % self.H, x % self.W]
+        return None if row < 0 else tuple(int(v) for v in self.placements[row])
+
+    def counts(self) -> Dict[int, int]:
+        """Number of tiles per format id, zeros included."""
+        ids, n = np.unique(self.placements["k"], return_counts=True)
+        found = dict(zip(ids.tolist(), n.tolist()))
+        return {int(k): found.get(int(k), 0) for k in self.formats[:, 0]}
+
+    def validate(self, cfg: TilingConfig) -> List[str]:
+        """Rules of cfg broken by the tiling, as messages; empty if it is valid."""
+        if cfg.grid_size != self.size[2]:
+            return [f"grid size {self.size[2]} cm, config has {cfg.grid_size} cm"]
+        found = []
+        unknown = np.unique(self.placements["k"][~self._known()])
+        if len(unknown):
+            found.append(f"unknown format ids {unknown.tolist()}")
+        _, cover = self._grid()
+        if (cover > 1).any():
+            found.append(f"{int((cover > 1).sum())} cells covered more than once")
+        if (cover == 0).any():
+            found.append(f"{int((cover == 0).sum())} cells not covered")
+
+        for k, n in self.counts().items():
+            if n < cfg.min_counts.get(k, 0):
+                found.append(f"format {k}: {n} below minimum")
+            if n > cfg.max_counts.get(k, self.W * self.H * 2):
+                found.append(f"format {k}: {n} above maximum")
+
+        wc, hc = self._dims()
+        if cfg.enforce_wrap:
+            if not (self.placements["i"] + wc > self.W).any():
+                found.append("no tile wraps horizontally")
+            if not (self.placements["j"] + hc > self.H).any():
+                found.append("no tile wraps vertically")
+        if cfg.enforce_no_straight_lines:
+            # a line is crossed where one tile lies on both sides of it;
+            # a tile at least as wide (high) as the floor meets itself at its
+            # first column (row). Gaps (-1) read the appended -1.
+            grid, covered = self.grid, self.grid >= 0
+            first_col = np.append(self.placements["i"], -1)[grid] == np.arange(self.W)
+            first_row = np.append(self.placements["j"], -1)[grid] == np.arange(self.H)[:, None]
+            across_v = (grid == np.roll(grid, 1, axis=1)) & covered & ~first_col
+            across_h = (grid == np.roll(grid, 1, axis=0)) & covered & ~first_row
+            if not across_v.any(axis=0).all() or not across_h.any(axis=1).all():
+                found.append("straight line through the floor")
+        return found
+
+    def save(self, path: str):
+        """Write to path: one .npz file, or a directory of .npy files."""
+        arrays = {name: getattr(self, name) for name in _ARRAYS}
+        if path.endswith(".npz"):
+            np.savez(path, **arrays)
+            return
+        os.makedirs(path, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), array)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> "TilingSolution":
+        """
+        Read a solution written by save(). With mmap a directory's arrays
+        are memory-mapped read-only instead of read; .npz files are
+        always read.
+        """
+        if path.endswith(".npz"):
+            with np.load(path) as data:
+                return cls(*(data[name] for name in _ARRAYS))
+        mode = "r" if mmap else None
+        return cls(*(np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+                     for name in _ARRAYS))
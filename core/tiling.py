@@ -1,16 +1,24 @@
 
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
+import dataclasses
 import random
 import os
 import re
+import hashlib
+import logging
+import queue
+import threading
+import time
 
 from dataclasses import dataclass, field
-from typing import Dict, Tuple, Optional
-from ortools.sat.python import cp_model
+from typing import Callable, Dict, List, Tuple, Optional
 
-import io
-from PIL import Image
+# OR-Tools, matplotlib and PIL are imported where they are first used:
+# together they take most of a second, which would delay the GUI window.
+
+# Every solve logs its TilingResult at INFO (as extra "tiling_result") and
+# each build phase at DEBUG, so production jobs can export the metrics with
+# an ordinary logging handler.
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -21,6 +29,10 @@ class TilingConfig:
     grid_size: int
     max_time_in_seconds: float = 60
     num_search_workers: int = 16
+    random_seed: Optional[int] = None  # CP-SAT default when None
+    # further CP-SAT parameters by name, enum values by their name, e.g.
+    # {"search_branching": "PSEUDO_COST_SEARCH", "linearization_level": 2}
+    solver_parameters: Dict[str, object] = field(default_factory=dict)
 
     # --- constraint toggles ---
     min_counts: Dict[int, int] = field(default_factory=dict)
@@ -29,136 +41,853 @@ class TilingConfig:
     enforce_no_straight_lines: bool = True
     four_corner_penalty_weight: Optional[int] = 50
 
-def solve_torus_tiling(width_cm: int,
-                       height_cm: int,
-                       cfg: TilingConfig):
-    # 1) validation
-    G = cfg.grid_size
-    assert width_cm % G == 0 and height_cm % G == 0, \
-        f"Floor dims must be multiples of {G}"
-    W, H = width_cm // G, height_cm // G
+    # --- search-space reduction ---
+    # single orientation for square formats + a tile anchored at cell (0,0)
+    break_symmetries: bool = False
+    # additionally break transpose / 90° rotation when W == H
+    break_dihedral_symmetries: bool = False
 
-    model = cp_model.CpModel()
+    # --- large floors ---
+    # first solve a smaller period dividing the floor and start the full
+    # search from it, tiled up to the floor size (see _coarse_solution)
+    multiscale: bool = False
 
-    # 2)
-    tile_cells = {
-        k: [(w//G, h//G), (h//G, w//G)]
-        for k,(w,h) in cfg.formats.items()
-    }
+    # --- formulation ---
+    # "placement": a seam or lattice point sums every placement crossing or
+    # touching it; "seam": one boolean per unit edge of the grid, linked to
+    # the placements crossing it, so the no-straight-lines rule and the
+    # four-corner points become small local constraints (see _add_edges)
+    formulation: str = "placement"
+    # "cpsat", "exact_cover" (core.exact_cover: the first valid tiling,
+    # cheap but not cost-optimal) or "auto": exact cover up to
+    # AUTO_EXACT_COVER_CELLS grid cells, CP-SAT above
+    backend: str = "cpsat"
 
-    # 3) variables X[k,i,j,o]
-    X = {}
-    for k in cfg.formats:
-        for o,(wc,hc) in enumerate(tile_cells[k]):
-            for i in range(W):
-                for j in range(H):
-                    X[k,i,j,o] = model.NewBoolVar(f"X_{k}_{i}_{j}_{o}")
-
-    # 4) coverage
-    for x in range(W):
-        for y in range(H):
-            model.Add(
-                sum(
-                    X[k,i,j,o]
-                    for k in cfg.formats
-                    for o,(wc,hc) in enumerate(tile_cells[k])
-                    for i in range(W)
-                    for j in range(H)
-                    if ((x-i)%W) < wc and ((y-j)%H) < hc
-                ) == 1
-            )
+FORMULATIONS = ("placement", "seam")
+BACKENDS = ("cpsat", "exact_cover", "auto")
+AUTO_EXACT_COVER_CELLS = 144  # 12×12
 
-    # 5) min/max counts
-    for k in cfg.formats:
-        min_c = cfg.min_counts.get(k, 0)
-        max_c = cfg.max_counts.get(k, W*H*2)  # sufitowe
-        expr = sum(X[k,i,j,o] for i in range(W) for j in range(H) for o in [0,1])
-        if min_c > 0:
-            model.Add(expr >= min_c)
-        if max_c is not None:
-            model.Add(expr <= max_c)
-
-    # 6)
-    if cfg.enforce_wrap:
-        model.Add(
-            sum(X[k,i,j,o]
-                for k in cfg.formats
-                for o,(wc,hc) in enumerate(tile_cells[k])
-                for i in range(W) for j in range(H)
-                if j+hc > H) >= 1
-        )
-        model.Add(
-            sum(X[k,i,j,o]
-                for k in cfg.formats
-                for o,(wc,hc) in enumerate(tile_cells[k])
-                for i in range(W) for j in range(H)
-                if i+wc > W) >= 1
-        )
+# timing phases that are search rather than model building
+_SEARCH_PHASES = ("coarse", "solve", "lns", "exact_cover")
 
-    # 7)
-    if cfg.enforce_no_straight_lines:
-        for b in range(W):
+
+@dataclass
+class TilingResult:
+    """
+    Outcome of one solve. placements is None unless a solution was found;
+    status is the CP-SAT status name (OPTIMAL, FEASIBLE, INFEASIBLE,
+    UNKNOWN, MODEL_INVALID). timings maps phase name to wall seconds: the
+    model build phases (measured when the TilingModel was built, so they
+    repeat across re-solves of the same model) followed by "instance"
+    (per-solve clone, bounds, objective, hints) and "solve"; "coarse"
+    (multiscale start), "lns" (core.lns) and "exact_cover" (its share of
+    an "auto" backend solve) also count as search time in summary().
+    trajectory lists (seconds since the solve started, objective) per
+    improvement. stats holds the CP-SAT counters, or those of core.lns /
+    core.portfolio. reason says why core.precheck rejected the floor
+    without solving.
+    """
+    status: str
+    placements: Optional[List[Tuple[int, int, int, int]]]
+    width_cm: int
+    height_cm: int
+    grid_size: int
+    objective: Optional[float] = None
+    best_bound: Optional[float] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    num_variables: int = 0
+    num_constraints: int = 0
+    stats: Dict[str, object] = field(default_factory=dict)
+    trajectory: List[Tuple[float, float]] = field(default_factory=list)
+    cached: bool = False
+    reason: Optional[str] = None
+
+    @property
+    def found(self) -> bool:
+        return self.placements is not None
+
+    def summary(self) -> str:
+        """One line for status bars and logs."""
+        parts = [self.status + (" (cached)" if self.cached else "")]
+        if self.objective is not None:
+            bound = f" (bound {self.best_bound:g})" if self.best_bound is not None else ""
+            parts.append(f"objective {self.objective:g}{bound}")
+        if self.timings:
+            search = sum(t for phase, t in self.timings.items() if phase in _SEARCH_PHASES)
+            build = sum(self.timings.values()) - search
+            parts.append(f"build {build:.2f} s, solve {search:.2f} s")
+        if self.num_variables:
+            parts.append(f"{self.num_variables} vars / {self.num_constraints} constraints")
+        if self.reason:
+            parts.append(self.reason)
+        return " · ".join(parts)
+
+
+class _PhaseTimer:
+    """Wall time of consecutive named phases."""
+
+    def __init__(self, timings: Dict[str, float]):
+        self.timings = timings
+        self._last = time.perf_counter()
+
+    def lap(self, phase: str):
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self.timings[phase] = self.timings.get(phase, 0.0) + elapsed
+        self._last = now
+        logger.debug("%s: %.3f s", phase, elapsed)
+
+
+def _tile_cells(formats: Dict[int, Tuple[int, int]], G: int,
+                dedupe_squares: bool = False):
+    """
+    Both orientations of every format, in grid cells. With dedupe_squares
+    a square format gets a single orientation, since rotating it places
+    exactly the same cells.
+    """
+    return {
+        k: [(w//G, h//G)] if dedupe_squares and w == h
+        else [(w//G, h//G), (h//G, w//G)]
+        for k,(w,h) in formats.items()
+    }
+
+
+def _placement_cells(i, j, wc, hc, W, H):
+    """Cells covered by a tile anchored at (i,j), wrapped on the torus."""
+    return [((i+dx) % W, (j+dy) % H)
+            for dx in range(min(wc, W))
+            for dy in range(min(hc, H))]
+
+
+def _placement_corners(i, j, wc, hc, W, H):
+    """Distinct lattice points touched by the corners of a placement."""
+    return {(i % W, j % H), ((i+wc) % W, j % H),
+            (i % W, (j+hc) % H), ((i+wc) % W, (j+hc) % H)}
+
+
+def _placement_inner_edges(i, j, wc, hc, W, H):
+    """
+    Unit edges inside a placement, which it crosses: vertical ones (b,y)
+    on grid line x=b left of cell (b,y), horizontal ones (x,r) on grid
+    line y=r above cell (x,r).
+    """
+    vertical = [((i+d) % W, (j+dy) % H)
+                for d in range(1, min(wc, W)) for dy in range(min(hc, H))]
+    horizontal = [((i+dx) % W, (j+d) % H)
+                  for d in range(1, min(hc, H)) for dx in range(min(wc, W))]
+    return vertical, horizontal
+
+
+def _build_indexes(W, H, tile_cells, X):
+    """
+    One pass over all placements, collecting for every cell, seam and
+    lattice point the variables that touch it. Every constraint is then
+    built from these lists instead of rescanning all of X.
+    """
+    cover = {(x, y): [] for x in range(W) for y in range(H)}
+    cols = {b: [] for b in range(W)}
+    rows = {r: [] for r in range(H)}
+    corners = {(b, r): [] for b in range(W) for r in range(H)}
+    for (k,i,j,o),var in X.items():
+        wc, hc = tile_cells[k][o]
+        for cell in _placement_cells(i, j, wc, hc, W, H):
+            cover[cell].append(var)
+        for d in range(1, min(wc, W)):
+            cols[(i+d) % W].append(var)
+        for d in range(1, min(hc, H)):
+            rows[(j+d) % H].append(var)
+        for p in _placement_corners(i, j, wc, hc, W, H):
+            corners[p].append(var)
+    return cover, cols, rows, corners
+
+
+def _build_edge_indexes(W, H, tile_cells, X):
+    """Unit edge -> variables of the placements crossing it."""
+    vertical = {(b, y): [] for b in range(W) for y in range(H)}
+    horizontal = {(x, r): [] for x in range(W) for r in range(H)}
+    for (k,i,j,o),var in X.items():
+        wc, hc = tile_cells[k][o]
+        inner_v, inner_h = _placement_inner_edges(i, j, wc, hc, W, H)
+        for e in inner_v:
+            vertical[e].append(var)
+        for e in inner_h:
+            horizontal[e].append(var)
+    return vertical, horizontal
+
+
+def _edges(placements, W, H, tile_cells):
+    """Unit edges on tile borders, as (vertical, horizontal) sets."""
+    vertical = {(b, y) for b in range(W) for y in range(H)}
+    horizontal = set(vertical)
+    for k,i,j,o in placements:
+        wc, hc = tile_cells[k][o]
+        inner_v, inner_h = _placement_inner_edges(i, j, wc, hc, W, H)
+        vertical.difference_update(inner_v)
+        horizontal.difference_update(inner_h)
+    return vertical, horizontal
+
+
+def _add_symmetry_breaking(model, X, tile_cells, W, H, cfg):
+    """
+    Every rule except the wrap constraint is invariant under torus
+    translation, so any solution can be shifted until some tile is
+    anchored at cell (0,0). With no-straight-lines enforced (or wrap
+    disabled) the shifted solution is still valid, so we may require it.
+    """
+    if not cfg.enforce_wrap or cfg.enforce_no_straight_lines:
+        model.Add(sum(X[k,0,0,o]
+                      for k in tile_cells
+                      for o in range(len(tile_cells[k]))) == 1)
+
+    # Transposing a square torus (alone or as part of a 90° rotation)
+    # swaps the orientation of every non-square tile and keeps the anchor
+    # at (0,0), so we keep only the side with more orientation-0 tiles.
+    if cfg.break_dihedral_symmetries and W == H:
+        flat = [(X[k,i,j,0], X[k,i,j,1])
+                for k in tile_cells if len(tile_cells[k]) == 2
+                for i in range(W) for j in range(H)]
+        if flat:
+            model.Add(sum(a for a,_ in flat) >= sum(b for _,b in flat))
+
+
+# share of max_time_in_seconds the multiscale mode may spend on the small
+# periods; too small ones are usually proven infeasible in milliseconds
+MULTISCALE_TIME_SHARE = 0.25
+
+
+def _divisors(n):
+    return [d for d in range(1, n + 1) if n % d == 0]
+
+
+def _lift(placements, pw, ph, W, H):
+    """Placements of a pw×ph period repeated over a W×H torus."""
+    return [(k, i + a*pw, j + b*ph, o)
+            for k,i,j,o in placements
+            for a in range(W // pw)
+            for b in range(H // ph)]
+
+
+def _four_corner_points(placements, W, H, tile_cells):
+    """Lattice points touched by the corners of four placements."""
+    touching = {}
+    for k,i,j,o in placements:
+        wc, hc = tile_cells[k][o]
+        for p in _placement_corners(i, j, wc, hc, W, H):
+            touching[p] = touching.get(p, 0) + 1
+    return {p for p,n in touching.items() if n == 4}
+
+
+def _objective_value(placements, W, H, tile_cells, cfg):
+    """Objective of a placement list, as the model would compute it."""
+    value = sum(cfg.weights.get(k, 0) for k,_,_,_ in placements)
+    if cfg.four_corner_penalty_weight is not None:
+        value += cfg.four_corner_penalty_weight * \
+            len(_four_corner_points(placements, W, H, tile_cells))
+    return value
+
+
+def _coarse_solution(width_cm, height_cm, cfg, time_limit):
+    """
+    Solution of the smallest period dividing the floor that can be solved
+    within time_limit, tiled up to the full floor; None if none is found.
+
+    Every rule survives the tiling: a seam of the floor is a seam of the
+    period, so it is crossed; a tile wrapping over the period edge wraps
+    over the floor edge in the last repeat; counts and corners scale with
+    the number of repeats, so the period gets min/max counts divided by
+    it. Both sides of the period must fit the longest tile, otherwise a
+    tile would overlap its own repeat, and with dihedral symmetry
+    breaking the period stays square, so the orientation rule holds too.
+    """
+    G = cfg.grid_size
+    W, H = width_cm // G, height_cm // G
+    tile_cells = _tile_cells(cfg.formats, G, cfg.break_symmetries)
+    longest = max(max(dims) for cells in tile_cells.values() for dims in cells)
+    square = cfg.break_dihedral_symmetries and W == H
+    periods = sorted(((pw, ph) for pw in _divisors(W) for ph in _divisors(H)
+                      if pw >= longest and ph >= longest and (pw, ph) != (W, H)
+                      and (pw == ph or not square)),
+                     key=lambda p: p[0] * p[1])
+
+    deadline = time.perf_counter() + time_limit
+    for pw, ph in periods:
+        left = deadline - time.perf_counter()
+        if left <= 0:
+            break
+        reps = (W // pw) * (H // ph)
+        min_counts = {k: -(-n // reps) for k,n in cfg.min_counts.items()}
+        max_counts = {k: n // reps for k,n in cfg.max_counts.items()}
+        if any(min_counts.get(k, 0) > n for k,n in max_counts.items()):
+            continue
+        sub_cfg = dataclasses.replace(
+            cfg, min_counts=min_counts, max_counts=max_counts,
+            max_time_in_seconds=min(left, time_limit / 2), multiscale=False)
+        result = TilingModel(pw * G, ph * G, sub_cfg).solve()
+        if result.found:
+            logger.info("multiscale: %dx%d cm period, %d repeats",
+                        pw * G, ph * G, reps)
+            return _lift(result.placements, pw, ph, W, H)
+    return None
+
+
+def _set_parameters(parameters, values: Dict[str, object]):
+    """Set CP-SAT SatParameters fields by name."""
+    for name, value in values.items():
+        if not hasattr(parameters, name):
+            raise ValueError(f"Unknown CP-SAT parameter: {name}")
+        if isinstance(value, str):
+            enum = type(getattr(parameters, name))
+            if hasattr(enum, value):
+                value = getattr(enum, value)
+            else:
+                # older OR-Tools: a protobuf message with int enum fields
+                spec = parameters.DESCRIPTOR.fields_by_name[name]
+                value = spec.enum_type.values_by_name[value].number
+        setattr(parameters, name, value)
+
+
+def _solution_callback(X, on_solution, trajectory, t0):
+    """
+    CpSolverSolutionCallback appending (time since t0, objective) to
+    trajectory for every improving solution and, if on_solution is given,
+    reporting it as placements.
+    """
+    from ortools.sat.python import cp_model
+
+    class SolutionCallback(cp_model.CpSolverSolutionCallback):
+        def on_solution_callback(self):
+            trajectory.append((time.perf_counter() - t0, self.ObjectiveValue()))
+            if on_solution is not None:
+                placements = [key for key,v in X.items() if self.Value(v)]
+                on_solution(placements, self.ObjectiveValue(),
+                            self.BestObjectiveBound())
+
+    return SolutionCallback()
+
+
+class TilingModel:
+    """
+    CP-SAT model of one floor, built once and solved many times.
+
+    Variables and structural constraints depend only on the floor size,
+    formats, grid size and the wrap / no-lines / symmetry flags. Costs,
+    min/max counts and the four-corner weight are applied on a clone of
+    the model at solve time, so they can change between solves, and
+    every solve is warm-started with the previous solution.
+    """
+
+    def __init__(self, width_cm: int, height_cm: int, cfg: TilingConfig):
+        # 1) validation
+        G = cfg.grid_size
+        assert width_cm % G == 0 and height_cm % G == 0, \
+            f"Floor dims must be multiples of {G}"
+        if cfg.formulation not in FORMULATIONS:
+            raise ValueError(f"Unknown formulation: {cfg.formulation}")
+        W, H = width_cm // G, height_cm // G
+        self.width_cm, self.height_cm, self.G = width_cm, height_cm, G
+        self.W, self.H = W, H
+        self.key = self.structure_key(width_cm, height_cm, cfg)
+        self.cfg = cfg
+        self.last_placements = None
+        self.build_timings = {}
+        self._solver = None
+        self._stop_requested = False
+        self._enumerators = set()
+
+        from ortools.sat.python import cp_model
+        model = cp_model.CpModel()
+        self.model = model
+        timer = _PhaseTimer(self.build_timings)
+
+        # 2)
+        tile_cells = _tile_cells(cfg.formats, G, cfg.break_symmetries)
+        self.tile_cells = tile_cells
+
+        # 3) variables X[k,i,j,o]
+        X = {}
+        per_format = {k: [] for k in cfg.formats}
+        for k in cfg.formats:
+            for o,(wc,hc) in enumerate(tile_cells[k]):
+                for i in range(W):
+                    for j in range(H):
+                        X[k,i,j,o] = model.NewBoolVar(f"X_{k}_{i}_{j}_{o}")
+                        per_format[k].append(X[k,i,j,o])
+        self.X = X
+        timer.lap("variables")
+
+        # cell / seam / corner -> placements covering it
+        cover, cols, rows, corners = _build_indexes(W, H, tile_cells, X)
+        self._corners = corners
+        timer.lap("indexes")
+
+        # 4) coverage
+        for x in range(W):
+            for y in range(H):
+                model.Add(sum(cover[x, y]) == 1)
+        timer.lap("coverage")
+
+        # 5) per-format counts; bounds are set per solve
+        self.N = {}
+        for k in cfg.formats:
+            self.N[k] = model.NewIntVar(0, len(per_format[k]), f"N_{k}")
+            model.Add(self.N[k] == sum(per_format[k]))
+        timer.lap("counts")
+
+        # 6)
+        if cfg.enforce_wrap:
             model.Add(
-                sum(X[k,i,j,o]
-                    for k in cfg.formats
-                    for o,(wc,_) in enumerate(tile_cells[k])
-                    for i in range(W) for j in range(H)
-                    if 0 < ((b-i)%W) < wc) >= 1
+                sum(var for (k,i,j,o),var in X.items()
+                    if j+tile_cells[k][o][1] > H) >= 1
             )
-        for r in range(H):
             model.Add(
-                sum(X[k,i,j,o]
-                    for k in cfg.formats
-                    for o,(_,hc) in enumerate(tile_cells[k])
-                    for i in range(W) for j in range(H)
-                    if 0 < ((r-j)%H) < hc) >= 1
+                sum(var for (k,i,j,o),var in X.items()
+                    if i+tile_cells[k][o][0] > W) >= 1
             )
-
-    # 8)
-    C = {}
-    if cfg.four_corner_penalty_weight is not None:
+        timer.lap("wrap")
+
+        # 7)
+        self.EV, self.EH = {}, {}
+        if cfg.enforce_no_straight_lines and cfg.formulation == "seam":
+            self._add_edges()
+            # a straight line is a grid line made of border edges only
+            for b in range(W):
+                model.Add(sum(self.EV[b, y] for y in range(H)) <= H - 1)
+            for r in range(H):
+                model.Add(sum(self.EH[x, r] for x in range(W)) <= W - 1)
+        elif cfg.enforce_no_straight_lines:
+            for b in range(W):
+                model.Add(sum(cols[b]) >= 1)
+            for r in range(H):
+                model.Add(sum(rows[r]) >= 1)
+        timer.lap("seams")
+
+        # 7b) symmetry breaking
+        if cfg.break_symmetries:
+            _add_symmetry_breaking(model, X, tile_cells, W, H, cfg)
+        timer.lap("symmetry")
+
+        # 8) added on first use, see _add_corner_indicators
+        self.C = {}
+        self.num_corners = None
+        if cfg.four_corner_penalty_weight is not None:
+            self._add_corner_indicators()
+
+    @staticmethod
+    def structure_key(width_cm: int, height_cm: int, cfg: TilingConfig):
+        """Everything that shapes the variables and structural constraints."""
+        return (width_cm, height_cm, cfg.grid_size,
+                tuple(sorted(cfg.formats.items())),
+                cfg.enforce_wrap, cfg.enforce_no_straight_lines,
+                cfg.break_symmetries, cfg.break_dihedral_symmetries,
+                cfg.formulation)
+
+    def matches(self, width_cm: int, height_cm: int, cfg: TilingConfig) -> bool:
+        return self.key == self.structure_key(width_cm, height_cm, cfg)
+
+    def _add_edges(self):
+        """
+        EV[b,y] / EH[x,r]: the unit edge left of / above cell (x,y) lies
+        on a tile border, i.e. no placement crosses it.
+        """
+        timer = _PhaseTimer(self.build_timings)
+        model = self.model
+        vertical, horizontal = _build_edge_indexes(self.W, self.H,
+                                                   self.tile_cells, self.X)
+        for (b,y),crossing in vertical.items():
+            self.EV[b,y] = model.NewBoolVar(f"EV_{b}_{y}")
+            model.Add(self.EV[b,y] + sum(crossing) == 1)
+        for (x,r),crossing in horizontal.items():
+            self.EH[x,r] = model.NewBoolVar(f"EH_{x}_{r}")
+            model.Add(self.EH[x,r] + sum(crossing) == 1)
+        timer.lap("edges")
+
+    def _real_borders(self):
+        """
+        EV / EH without the edges where a full-width or full-height tile
+        meets itself, which the placement formulation does not count as
+        corners either.
+        """
+        model, W, H = self.model, self.W, self.H
+        touching_v, touching_h = {}, {}
+        for (k,i,j,o),var in self.X.items():
+            wc, hc = self.tile_cells[k][o]
+            if wc >= W:
+                for dy in range(min(hc, H)):
+                    touching_v.setdefault((i, (j+dy) % H), []).append(var)
+            if hc >= H:
+                for dx in range(min(wc, W)):
+                    touching_h.setdefault(((i+dx) % W, j), []).append(var)
+
+        def borders(E, touching, name):
+            real = dict(E)
+            for key,own in touching.items():
+                real[key] = model.NewBoolVar(f"{name}_{key[0]}_{key[1]}")
+                model.Add(real[key] + sum(own) == E[key])
+            return real
+
+        return (borders(self.EV, touching_v, "BV"),
+                borders(self.EH, touching_h, "BH"))
+
+    def _add_corner_indicators(self):
+        if self.cfg.formulation == "seam" and not self.EV:
+            self._add_edges()
+        timer = _PhaseTimer(self.build_timings)
+        model, C = self.model, self.C
+        W, H = self.W, self.H
+        if self.EV:
+            EV, EH = self._real_borders()
         for b in range(W):
             for r in range(H):
                 C[b,r] = model.NewBoolVar(f"C_{b}_{r}")
-                corners = []
-                for k in cfg.formats:
-                    for o,(wc,hc) in enumerate(tile_cells[k]):
-                        for i in range(W):
-                            for j in range(H):
-                                if ((i%W)==b and (j%H)==r) or \
-                                   ((i+wc)%W==b and (j%H)==r) or \
-                                   ((i%W)==b and (j+hc)%H==r) or \
-                                   ((i+wc)%W==b and (j+hc)%H==r):
-                                    corners.append(X[k,i,j,o])
-                model.Add(sum(corners)==4).OnlyEnforceIf(C[b,r])
-                model.Add(sum(corners)<=3).OnlyEnforceIf(C[b,r].Not())
-
-    # 9)
-    obj_terms = []
-    for k,w in cfg.weights.items():
-        obj_terms.append(
-            w * sum(X[k,i,j,o] for i in range(W) for j in range(H) for o in [0,1])
+                if self.EV:
+                    # four tiles meet at (b,r) iff its four edges are borders
+                    edges = [EV[b, (r-1) % H], EV[b, r],
+                             EH[(b-1) % W, r], EH[b, r]]
+                    model.AddBoolAnd(edges).OnlyEnforceIf(C[b,r])
+                    model.AddBoolOr([e.Not() for e in edges]).OnlyEnforceIf(C[b,r].Not())
+                    continue
+                model.Add(sum(self._corners[b, r])==4).OnlyEnforceIf(C[b,r])
+                model.Add(sum(self._corners[b, r])<=3).OnlyEnforceIf(C[b,r].Not())
+        self.num_corners = model.NewIntVar(0, len(C), "num_corners")
+        model.Add(self.num_corners == sum(C.values()))
+        timer.lap("corners")
+
+    def stop(self):
+        """
+        Ask a running solve() to finish early with the best solution found
+        so far. Safe to call from another thread.
+        """
+        self._stop_requested = True
+        solver = self._solver
+        if solver is not None:
+            solver.StopSearch()
+        for solver in list(self._enumerators):
+            solver.StopSearch()
+
+    def _instance(self, cfg: TilingConfig):
+        """
+        Clone of the structural model with the count bounds of cfg, and a
+        function mapping our variables to the clone's.
+        """
+        if self.key != self.structure_key(self.width_cm, self.height_cm, cfg):
+            raise ValueError("Config changes the model structure; "
+                             "build a new TilingModel")
+        model = self.model.Clone()
+
+        def var(v):
+            return model.GetIntVarFromProtoIndex(v.Index())
+
+        # 5) min/max counts
+        for k in cfg.formats:
+            min_c = cfg.min_counts.get(k, 0)
+            max_c = cfg.max_counts.get(k, self.W*self.H*2)  # sufitowe
+            if min_c > 0:
+                model.Add(var(self.N[k]) >= min_c)
+            if max_c is not None:
+                model.Add(var(self.N[k]) <= max_c)
+        return model, var
+
+    def solve(self, cfg: Optional[TilingConfig] = None, hint=None,
+              on_solution: Optional[Callable] = None):
+        """
+        Solve with the costs, count bounds and four-corner weight of cfg
+        (default: the config the model was built with). hint is a list of
+        placements to warm-start from; by default the previous solution
+        of this model is used, and with cfg.multiscale and nothing to
+        start from, a tiled-up solution of a smaller period. If the full
+        search then ends without a better solution, the tiled-up one is
+        returned as FEASIBLE. on_solution(placements, objective, bound) is
+        called from the solver thread for every improving solution, and
+        first for the tiled-up one, with bound None. Returns a
+        TilingResult; a floor rejected by core.precheck comes back
+        INFEASIBLE with the reason, unsolved.
+        """
+        cfg = cfg or self.cfg
+        # count bounds may have changed since the build
+        from core.precheck import infeasible
+        rejected = infeasible(self.width_cm, self.height_cm, cfg)
+        if rejected is not None:
+            logger.info("%dx%d cm: %s", self.width_cm, self.height_cm,
+                        rejected.summary(), extra={"tiling_result": rejected})
+            return rejected
+        if cfg.four_corner_penalty_weight is not None and not self.C:
+            self._add_corner_indicators()
+        timings = dict(self.build_timings)
+        timer = _PhaseTimer(timings)
+        t0 = time.perf_counter()
+
+        hint = hint if hint is not None else self.last_placements
+        coarse = None
+        trajectory = []
+        time_limit = cfg.max_time_in_seconds
+        if not hint and cfg.multiscale:
+            coarse = _coarse_solution(self.width_cm, self.height_cm, cfg,
+                                      time_limit * MULTISCALE_TIME_SHARE)
+            hint = coarse
+            timer.lap("coarse")
+            time_limit = max(0.0, time_limit - timings["coarse"])
+        if coarse:
+            # the tiled-up period is the first incumbent
+            coarse_objective = _objective_value(coarse, self.W, self.H,
+                                                self.tile_cells, cfg)
+            trajectory.append((timings["coarse"], coarse_objective))
+            if on_solution is not None:
+                on_solution(coarse, coarse_objective, None)
+
+        model, var = self._instance(cfg)
+
+        # 9)
+        obj_terms = []
+        for k,w in cfg.weights.items():
+            obj_terms.append(w * var(self.N[k]))
+        if cfg.four_corner_penalty_weight is not None:
+            obj_terms.append(cfg.four_corner_penalty_weight * var(self.num_corners))
+
+        model.Minimize(sum(obj_terms))
+
+        # warm start
+        if hint:
+            chosen = set(hint)
+            for key,v in self.X.items():
+                model.AddHint(var(v), key in chosen)
+            # counts and corner indicators too: CP-SAT checks a complete
+            # hint before presolve, which on big floors can take longer
+            # than the whole time limit
+            for k,n in self.N.items():
+                model.AddHint(var(n), sum(1 for p in hint if p[0] == k))
+            if self.C:
+                four = _four_corner_points(hint, self.W, self.H, self.tile_cells)
+                for p,c in self.C.items():
+                    model.AddHint(var(c), p in four)
+                model.AddHint(var(self.num_corners), len(four))
+            if self.EV:
+                vertical, horizontal = _edges(hint, self.W, self.H, self.tile_cells)
+                for e,v in self.EV.items():
+                    model.AddHint(var(v), e in vertical)
+                for e,v in self.EH.items():
+                    model.AddHint(var(v), e in horizontal)
+        timer.lap("instance")
+
+        # 10) solve
+        from ortools.sat.python import cp_model
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = time_limit
+        solver.parameters.num_search_workers = cfg.num_search_workers
+        if cfg.random_seed is not None:
+            solver.parameters.random_seed = cfg.random_seed
+        _set_parameters(solver.parameters, cfg.solver_parameters)
+        X = {key: var(v) for key,v in self.X.items()} if on_solution else None
+        callback = _solution_callback(X, on_solution, trajectory, t0)
+        self._solver = solver
+        try:
+            if self._stop_requested:
+                # stop() arrived before the search started
+                solver.parameters.max_time_in_seconds = 0
+            status = solver.Solve(model, callback)
+        finally:
+            self._solver = None
+            self._stop_requested = False
+        timer.lap("solve")
+
+        proto = model.Proto()
+        result = TilingResult(
+            status=solver.StatusName(status),
+            placements=None,
+            width_cm=self.width_cm,
+            height_cm=self.height_cm,
+            grid_size=self.G,
+            timings=timings,
+            trajectory=trajectory,
+            num_variables=len(proto.variables),
+            num_constraints=len(proto.constraints),
+            stats={
+                "num_booleans": solver.NumBooleans(),
+                "num_branches": solver.NumBranches(),
+                "num_conflicts": solver.NumConflicts(),
+                "wall_time": solver.WallTime(),
+                "user_time": solver.UserTime(),
+                "deterministic_time": solver.ResponseProto().deterministic_time,
+            },
         )
-    if cfg.four_corner_penalty_weight is not None:
-        obj_terms.append(cfg.four_corner_penalty_weight * sum(C.values()))
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            result.objective = solver.ObjectiveValue()
+            result.best_bound = solver.BestObjectiveBound()
+            result.placements = [key for key,v in self.X.items()
+                                 if solver.Value(var(v))]
+            self.last_placements = result.placements
+        if coarse:
+            # presolve may drop the hint, so the search can end up worse
+            if result.objective is None or coarse_objective < result.objective:
+                result.status = "FEASIBLE"
+                result.placements = coarse
+                result.objective = coarse_objective
+                self.last_placements = coarse
+        logger.info("%dx%d cm: %s", self.width_cm, self.height_cm,
+                    result.summary(), extra={"tiling_result": result})
+        return result
+
+    def iter_solutions(self, cfg: Optional[TilingConfig] = None,
+                       limit: Optional[int] = None, dihedral: bool = False):
+        """
+        Lazily yield distinct tilings (lists of placements) that satisfy
+        the structural rules and count bounds of cfg; costs are ignored.
+        Tilings equal up to torus translation are yielded once, and with
+        dihedral=True also those equal up to mirroring / transposition.
+
+        CP-SAT enumerates in a background thread that blocks until the
+        consumer asks for the next solution, so only one solution is in
+        flight at a time. The search budget cfg.max_time_in_seconds is
+        applied as deterministic time, so a slow consumer doesn't eat
+        into it. Closing the generator stops the search.
+        """
+        from ortools.sat.python import cp_model
+        cfg = cfg or self.cfg
+        model, var = self._instance(cfg)
+        X = {key: var(v) for key,v in self.X.items()}
+
+        solver = cp_model.CpSolver()
+        solver.parameters.enumerate_all_solutions = True
+        solver.parameters.num_search_workers = 1
+        solver.parameters.max_deterministic_time = cfg.max_time_in_seconds
+
+        handoff = queue.Queue(maxsize=1)
+        closed = threading.Event()
+        done = object()
+
+        def put(item):
+            while not closed.is_set():
+                try:
+                    handoff.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        class Enumerator(cp_model.CpSolverSolutionCallback):
+            def on_solution_callback(self):
+                if not put([key for key,v in X.items() if self.Value(v)]):
+                    self.StopSearch()
+
+        def run():
+            try:
+                solver.Solve(model, Enumerator())
+            finally:
+                put(done)
+
+        self._enumerators.add(solver)
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        seen = set()
+        try:
+            while limit is None or len(seen) < limit:
+                placements = handoff.get()
+                if placements is done:
+                    return
+                form = canonical_form(placements, self.W, self.H,
+                                      self.tile_cells, dihedral)
+                if form in seen:
+                    continue
+                seen.add(form)
+                yield placements
+        finally:
+            closed.set()
+            solver.StopSearch()
+            worker.join()
+            self._enumerators.discard(solver)
+            # a stop() meant for this enumeration must not cut the next solve()
+            self._stop_requested = False
+
+
+def resolve_backend(width_cm: int, height_cm: int, cfg: TilingConfig) -> str:
+    """"cpsat" or "exact_cover", the backend cfg.backend picks for this floor."""
+    if cfg.backend not in BACKENDS:
+        raise ValueError(f"Unknown backend: {cfg.backend}")
+    if cfg.backend != "auto":
+        return cfg.backend
+    cells = (width_cm // cfg.grid_size) * (height_cm // cfg.grid_size)
+    return "exact_cover" if cells <= AUTO_EXACT_COVER_CELLS else "cpsat"
+
+
+def make_model(width_cm: int, height_cm: int, cfg: TilingConfig):
+    """TilingModel, or core.exact_cover.ExactCoverModel if cfg selects it."""
+    if resolve_backend(width_cm, height_cm, cfg) == "exact_cover":
+        from core.exact_cover import ExactCoverModel
+        return ExactCoverModel(width_cm, height_cm, cfg)
+    return TilingModel(width_cm, height_cm, cfg)
 
-    model.Minimize(sum(obj_terms))
 
-    # 10) solve
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = cfg.max_time_in_seconds
-    solver.parameters.num_search_workers = cfg.num_search_workers
-    status = solver.Solve(model)
-    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
-        return None
+def solve_torus_tiling(width_cm: int,
+                       height_cm: int,
+                       cfg: TilingConfig) -> TilingResult:
+    # floors that fail the pre-check are rejected before the model is built
+    from core.precheck import infeasible
+    rejected = infeasible(width_cm, height_cm, cfg)
+    if rejected is not None:
+        return rejected
+    return make_model(width_cm, height_cm, cfg).solve()
 
-    placements = [(k,i,j,o) for (k,i,j,o),v in X.items() if solver.Value(v)]
-    return placements, width_cm, height_cm, G
+
+def iter_torus_tilings(width_cm: int,
+                       height_cm: int,
+                       cfg: TilingConfig,
+                       limit: Optional[int] = None,
+                       dihedral: bool = False):
+    """Generator of distinct tilings, see TilingModel.iter_solutions."""
+    yield from TilingModel(width_cm, height_cm, cfg).iter_solutions(
+        cfg, limit=limit, dihedral=dihedral)
+
+
+def canonical_form(placements, W, H, tile_cells, dihedral=False):
+    """
+    Hash identifying a tiling up to torus translation, and with dihedral
+    also up to mirror images (plus transposition when W == H).
+
+    The canonical representative is the lexicographically smallest sorted
+    list of (k, i, j, wc, hc) over all translations. It must start with an
+    anchor of the smallest format id moved to (0,0), so only those
+    translations are tried.
+    """
+    rects = [(k, i, j) + tuple(tile_cells[k][o]) for k,i,j,o in placements]
+    variants = [rects]
+    if dihedral:
+        variants.append([(k, (-i-wc) % W, j, wc, hc) for k,i,j,wc,hc in rects])
+        variants.append([(k, i, (-j-hc) % H, wc, hc) for k,i,j,wc,hc in rects])
+        variants.append([(k, (-i-wc) % W, (-j-hc) % H, wc, hc)
+                         for k,i,j,wc,hc in rects])
+        if W == H:
+            variants += [[(k, j, i, hc, wc) for k,i,j,wc,hc in v]
+                         for v in list(variants)]
+
+    best = None
+    for v in variants:
+        k_min = min(r[0] for r in v)
+        for _,i0,j0,_,_ in (r for r in v if r[0] == k_min):
+            shifted = sorted((k, (i-i0) % W, (j-j0) % H, wc, hc)
+                             for k,i,j,wc,hc in v)
+            if best is None or shifted < best:
+                best = shifted
+    return hashlib.sha1(repr(best).encode()).hexdigest()
 
 
 
 def draw_tiling(placements, width_cm: int, height_cm: int, G: int,
-                formats: Dict[int, Tuple[int,int]]):
+                formats: Dict[int, Tuple[int,int]],
+                backend: str = "raster", **kwargs):
+    """
+    3×3 preview of a tiling as a PIL image. The default "raster" backend
+    is core.render.render_tiling (kwargs are passed on to it); the
+    "matplotlib" backend draws vector patches at 300 dpi.
+    """
+    if backend == "raster":
+        from core.render import render_tiling
+        return render_tiling(placements, width_cm, height_cm, G, formats, **kwargs)
+    if backend != "matplotlib":
+        raise ValueError(f"Unknown backend: {backend}")
+    import io
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+    from PIL import Image
+
     # Recompute tile_cells for drawing
     tile_cells = {
         k: [(w // G, h // G), (h // G, w // G)]
@@ -1,16 +1,26 @@
-from PIL import Image, ImageTk
 from tkinter import ttk, messagebox, filedialog
 
-from PIL import ImageTk
-
-from core.tiling import TilingConfig, solve_torus_tiling, draw_tiling
+from core.tiling import BACKENDS, TilingConfig, TilingModel, draw_tiling, resolve_backend
+from core.cache import SolutionCache, cached_solve
+from core.precheck import infeasible, precheck
 from functools import reduce
 from math import gcd
 
+import queue
+import threading
+from collections import OrderedDict
+
 
 import tkinter as tk
 from tkinter import ttk
 
+def _warm_up_imports():
+    """Import the heavy modules core.tiling defers, off the Tk thread."""
+    import ortools.sat.python.cp_model  # noqa: F401
+    import PIL.ImageTk  # noqa: F401
+    import core.render  # noqa: F401
+
+
 class TilingApp(tk.Tk):
 
     DEFAULT_TILE_TYPES = [
@@ -20,12 +30,31 @@ class TilingApp(tk.Tk):
         (4, 60, 40, 7,  1, 100),
         (5, 60, 60, 9,  1, 100),
     ]
+    PREVIEW_DEBOUNCE_MS = 150
+    PREVIEW_CACHE_SIZE = 4
+    WARM_UP_DELAY_MS = 200
+
     def __init__(self):
         super().__init__()
         self.title("Torus Tiling Solver")
-        self.last_image = None
+        self._last_tiling = None        # (placements, width, height, G, formats)
+        self._preview_cache = OrderedDict()  # cell_px -> rendered PIL image
+        self._resize_job = None
         self._current_tkimg = None
+        self._tiling_model = None
+        self._server = ""               # job server of the running solve, "" if local
+        self._pattern_iter = None
+        self._pattern_key = None
+        self._pattern_count = 0
+        try:
+            self._cache = SolutionCache()
+        except Exception:
+            # the cache is an optimisation only; solve without it
+            self._cache = None
         self._build_widgets()
+        # load the solver and renderer while the user is still typing
+        self.after(self.WARM_UP_DELAY_MS, lambda: threading.Thread(
+            target=_warm_up_imports, daemon=True).start())
 
     def _build_widgets(self):
         # ─── Tile types list ────────────────────────────────────────
@@ -96,6 +125,27 @@ class TilingApp(tk.Tk):
         self.penalty_var = tk.StringVar(value="50")
         ttk.Entry(params_frame, textvariable=self.penalty_var).grid(row=3, column=1, padx=5, pady=2)
 
+        # multiscale start for large floors
+        self.multiscale_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(params_frame, text="Multiscale", variable=self.multiscale_var)\
+            .grid(row=3, column=2, padx=5, pady=2)
+
+        # edge-variable formulation, see TilingConfig.formulation
+        self.seam_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(params_frame, text="Seam model", variable=self.seam_var)\
+            .grid(row=3, column=3, padx=5, pady=2)
+
+        # solver backend, see TilingConfig.backend
+        ttk.Label(params_frame, text="Backend:").grid(row=4, column=0, sticky="e", padx=5, pady=2)
+        self.backend_var = tk.StringVar(value="cpsat")
+        ttk.Combobox(params_frame, textvariable=self.backend_var, values=BACKENDS,
+                     state="readonly").grid(row=4, column=1, padx=5, pady=2)
+
+        # job server (python -m core.server); empty solves in this process
+        ttk.Label(params_frame, text="Server:").grid(row=4, column=2, sticky="e", padx=5, pady=2)
+        self.server_var = tk.StringVar(value="")
+        ttk.Entry(params_frame, textvariable=self.server_var).grid(row=4, column=3, padx=5, pady=2)
+
         # ─── Preview ────────────────────────────────────────────────
         self.preview_frame = ttk.LabelFrame(self, text="Preview")
         self.preview_frame.pack(fill="both", expand=True, padx=10, pady=5)
@@ -107,11 +157,21 @@ class TilingApp(tk.Tk):
         # Bind resize event on the frame or the canvas:
         self.preview_canvas.bind("<Configure>", self._update_preview)
 
+        # one-line solver status under the preview
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(self.preview_frame, textvariable=self.status_var, anchor="w")\
+            .pack(fill="x")
+
         # ─── Buttons ────────────────────────────────────────────────
         btn_frame = ttk.Frame(self)
         btn_frame.pack(fill="x", padx=10, pady=5)
         self.solve_btn = ttk.Button(btn_frame, text="Solve", command=self._on_solve)
         self.solve_btn.pack(side="left")
+        self.stop_btn = ttk.Button(btn_frame, text="Stop", command=self._on_stop,
+                                   state="disabled")
+        self.stop_btn.pack(side="left", padx=5)
+        self.next_btn = ttk.Button(btn_frame, text="Next pattern", command=self._on_next_pattern)
+        self.next_btn.pack(side="left")
         self.save_btn = ttk.Button(btn_frame, text="Save image", command=self._on_save_image)
         self.save_btn.pack(side="right")
 
@@ -125,8 +185,16 @@ class TilingApp(tk.Tk):
         )
 
     def _update_preview(self, event=None):
-        # Ensure preview_canvas exists and there's an image
-        if not hasattr(self, "preview_canvas") or self.last_image is None:
+        # <Configure> fires continuously while the window is being resized;
+        # re-render once it has settled
+        if self._resize_job is not None:
+            self.after_cancel(self._resize_job)
+        self._resize_job = self.after(self.PREVIEW_DEBOUNCE_MS, self._render_preview)
+
+    def _render_preview(self):
+        self._resize_job = None
+        # Ensure preview_canvas exists and there's a tiling
+        if not hasattr(self, "preview_canvas") or self._last_tiling is None:
             return
 
         w = self.preview_canvas.winfo_width()
@@ -134,12 +202,21 @@ class TilingApp(tk.Tk):
         if w < 10 or h < 10:
             return
 
-        orig_w, orig_h = self.last_image.size
-        scale = min(w/orig_w, h/orig_h, 1.0)
-        new_size = (int(orig_w*scale), int(orig_h*scale))
-
-        resized = self.last_image.resize(new_size, resample=Image.Resampling.LANCZOS)
-        self._current_tkimg = ImageTk.PhotoImage(resized)
+        # Render straight at the canvas size instead of downscaling a big
+        # bitmap; sizes are quantized to whole pixels per grid cell, so
+        # small resizes are served from the cache
+        placements, width, height, G, formats = self._last_tiling
+        cell_px = max(1, min(w // (3 * (width // G)), h // (3 * (height // G))))
+        img = self._preview_cache.get(cell_px)
+        if img is None:
+            img = draw_tiling(placements, width, height, G, formats, cell_px=cell_px)
+            self._preview_cache[cell_px] = img
+            if len(self._preview_cache) > self.PREVIEW_CACHE_SIZE:
+                self._preview_cache.popitem(last=False)
+        else:
+            self._preview_cache.move_to_end(cell_px)
+        from PIL import ImageTk
+        self._current_tkimg = ImageTk.PhotoImage(img)
 
         # Remove previous image and draw new one centered
         self.preview_canvas.delete("IMG")
@@ -155,83 +232,239 @@ class TilingApp(tk.Tk):
         for item in self.tree_types.selection():
             self.tree_types.delete(item)
 
+    def _read_config(self):
+        """Read floor size and TilingConfig from the widgets."""
+        # 1) Read tile types from Treeview
+        items = self.tree_types.get_children()
+        if not items:
+            raise ValueError("You must add at least one tile type.")
+        formats = {}
+        weights = {}
+        min_counts = {}
+        max_counts = {}
+        for item in items:
+            vals = self.tree_types.item(item, "values")
+            tid = int(vals[0])
+            w_cm = int(vals[1])
+            h_cm = int(vals[2])
+            wt = float(vals[3])
+            mn = int(vals[4])
+            mx = int(vals[5])
+            formats[tid] = (w_cm, h_cm)
+            weights[tid] = wt
+            if mn > 0:
+                min_counts[tid] = mn
+            if mx > 0:
+                max_counts[tid] = mx
+
+        # 2) Read floor dimensions
+        width = int(self.width_var.get())
+        height = int(self.height_var.get())
+
+        # 3) Auto-calculate grid_size based on the GCD of all dimensions
+        all_dims = [d for dims in formats.values() for d in dims]
+        grid_size = reduce(gcd, all_dims)
+
+        # 4) Build configuration
+        cfg = TilingConfig(
+            formats=formats,
+            weights=weights,
+            grid_size=grid_size,
+            max_time_in_seconds=float(self.time_var.get()),
+            num_search_workers=int(self.workers_var.get()),
+            min_counts=min_counts,
+            max_counts=max_counts,
+            enforce_wrap=self.wrap_var.get(),
+            enforce_no_straight_lines=self.no_lines_var.get(),
+            four_corner_penalty_weight=int(self.penalty_var.get()) if self.penalty_var.get() else None,
+            multiscale=self.multiscale_var.get(),
+            formulation="seam" if self.seam_var.get() else "placement",
+            backend=self.backend_var.get()
+        )
+        return width, height, cfg
+
+    def _set_solving(self, solving: bool):
+        cursor = "watch" if solving else ""
+        self.config(cursor=cursor)
+        self.preview_canvas.config(cursor=cursor)
+        self.solve_btn.config(state="disabled" if solving else "normal")
+        self.next_btn.config(state="disabled" if solving else "normal")
+        self.save_btn.config(state="disabled" if solving else "normal")
+        self.stop_btn.config(state="normal" if solving else "disabled")
+        self.update_idletasks()
+
     def _on_solve(self):
+        try:
+            width, height, cfg = self._read_config()
+        except Exception as e:
+            messagebox.showerror("Data error", str(e))
+            return
 
-        self.config(cursor="watch")
-        self.preview_canvas.config(cursor="watch")
-        self.solve_btn.config(state="disabled")
-        self.save_btn.config(state="disabled")
-        self.update_idletasks()
+        # The solver runs in a worker thread (OR-Tools releases the GIL
+        # while searching) and reports back through a queue that the Tk
+        # main loop polls, so the window stays responsive.
+        self._set_solving(True)
+        self.status_var.set("Solving...")
+        self._solver_queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._server = self.server_var.get().strip()
+        threading.Thread(target=self._solve_worker,
+                         args=(width, height, cfg, self._solver_queue, self._server),
+                         daemon=True).start()
+        self.after(100, self._poll_solver, self._solver_queue, width, height, cfg,
+                   lambda result, error: self._on_solve_done(result, error, width, height, cfg))
+
+    def _model_for(self, width, height, cfg, backend=None):
+        # the compiled model is reused (and warm-started) while only costs,
+        # counts or the corner penalty change
+        backend = backend or resolve_backend(width, height, cfg)
+        model_class = TilingModel
+        if backend == "exact_cover":
+            from core.exact_cover import ExactCoverModel
+            model_class = ExactCoverModel
+        if not isinstance(self._tiling_model, model_class) or \
+                not self._tiling_model.matches(width, height, cfg):
+            self._tiling_model = model_class(width, height, cfg)
+        return self._tiling_model
+
+    def _solve_worker(self, width, height, cfg, out, server=""):
         try:
-            try:
-                # 1) Read tile types from Treeview
-                items = self.tree_types.get_children()
-                if not items:
-                    raise ValueError("You must add at least one tile type.")
-                formats = {}
-                weights = {}
-                min_counts = {}
-                max_counts = {}
-                for item in items:
-                    vals = self.tree_types.item(item, "values")
-                    tid = int(vals[0])
-                    w_cm = int(vals[1])
-                    h_cm = int(vals[2])
-                    wt = float(vals[3])
-                    mn = int(vals[4])
-                    mx = int(vals[5])
-                    formats[tid] = (w_cm, h_cm)
-                    weights[tid] = wt
-                    if mn > 0:
-                        min_counts[tid] = mn
-                    if mx > 0:
-                        max_counts[tid] = mx
-
-                # 2) Read floor dimensions
-                width = int(self.width_var.get())
-                height = int(self.height_var.get())
-
-                # 3) Auto-calculate grid_size based on the GCD of all dimensions
-                all_dims = [d for dims in formats.values() for d in dims]
-                grid_size = reduce(gcd, all_dims)
-
-                # 4) Build configuration
-                cfg = TilingConfig(
-                    formats=formats,
-                    weights=weights,
-                    grid_size=grid_size,
-                    max_time_in_seconds=float(self.time_var.get()),
-                    num_search_workers=int(self.workers_var.get()),
-                    min_counts=min_counts,
-                    max_counts=max_counts,
-                    enforce_wrap=self.wrap_var.get(),
-                    enforce_no_straight_lines=self.no_lines_var.get(),
-                    four_corner_penalty_weight=int(self.penalty_var.get()) if self.penalty_var.get() else None
-                )
-            except Exception as e:
-                messagebox.showerror("Data error", str(e))
+            # 5) Run solver, unless the pre-check already rules it out
+            rejected = infeasible(width, height, cfg)
+            if rejected is not None:
+                out.put(("done", rejected, None))
                 return
 
-            # 5) Run solver
-            result = solve_torus_tiling(width, height, cfg)
-            if not result:
-                messagebox.showinfo("No solution",
-                                    f"No solution found for {width}×{height} cm.")
+            def on_solution(placements, objective, bound):
+                out.put(("solution", placements, objective, bound))
+
+            if server:
+                # the server caches and picks the workers; Stop leaves the
+                # job running there for other clients
+                from core.server import TilingClient
+                result = TilingClient(server).solve(width, height, cfg, on_solution=on_solution,
+                                                    stop=self._stop_event)
+                out.put(("done", result, None))
                 return
+            def build():
+                # only on a cache miss, a cached optimum needs no model
+                model = self._model_for(width, height, cfg)
+                if self._stop_event.is_set():
+                    model.stop()
+                return model
+
+            result = cached_solve(width, height, cfg, self._cache,
+                                  model=build, on_solution=on_solution)
+            out.put(("done", result, None))
+        except Exception as e:
+            out.put(("done", None, e))
+
+    def _poll_solver(self, out, width, height, cfg, on_done):
+        latest = None
+        done = None
+        while True:
+            try:
+                msg = out.get_nowait()
+            except queue.Empty:
+                break
+            if msg[0] == "solution":
+                latest = msg
+            else:
+                done = msg
+
+        if done is not None:
+            on_done(done[1], done[2])
+            return
+        if latest is not None:
+            # only the newest incumbent is drawn, older ones are skipped
+            _, placements, objective, bound = latest
+            bound = f" (bound {bound:g})" if bound is not None else ""
+            self.status_var.set(f"Objective {objective:g}{bound} - searching...")
+            self._show_tiling(placements, width, height, cfg.grid_size, cfg.formats)
+        self.after(100, self._poll_solver, out, width, height, cfg, on_done)
+
+    def _on_solve_done(self, result, error, width, height, cfg):
+        self._set_solving(False)
+        if error is not None:
+            self.status_var.set("")
+            messagebox.showerror("Solver error", str(error))
+            return
+        self.status_var.set(result.summary())
+        if not result.found:
+            detail = f":\n{result.reason}" if result.reason else f" ({result.status})."
+            messagebox.showinfo("No solution",
+                                f"No solution found for {width}×{height} cm{detail}")
+            return
+
+        self._show_tiling(result.placements, result.width_cm, result.height_cm,
+                          result.grid_size, cfg.formats)
+
+    def _on_next_pattern(self):
+        try:
+            width, height, cfg = self._read_config()
+        except Exception as e:
+            messagebox.showerror("Data error", str(e))
+            return
 
-            placements, w_out, h_out, G = result
+        # keep pulling from the same generator while the inputs are unchanged
+        key = (width, height, repr(cfg))
+        if key != self._pattern_key:
+            if self._pattern_iter is not None:
+                self._pattern_iter.close()
+            self._pattern_iter = None
+            self._pattern_key = key
+            self._pattern_count = 0
+
+        self._set_solving(True)
+        self.status_var.set("Searching for the next pattern...")
+        self._solver_queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._server = ""
+        threading.Thread(target=self._pattern_worker,
+                         args=(width, height, cfg, self._solver_queue),
+                         daemon=True).start()
+        self.after(100, self._poll_solver, self._solver_queue, width, height, cfg,
+                   lambda result, error: self._on_pattern_done(result, error, width, height, cfg))
+
+    def _pattern_worker(self, width, height, cfg, out):
+        try:
+            if self._pattern_iter is None:
+                reason = precheck(width, height, cfg)
+                if reason is not None:
+                    raise ValueError(reason)
+                # enumeration needs the CP-SAT model, whatever the backend
+                model = self._model_for(width, height, cfg, backend="cpsat")
+                self._pattern_iter = model.iter_solutions(cfg, dihedral=True)
+            placements = next(self._pattern_iter, None)
+            out.put(("done", placements, None))
+        except Exception as e:
+            out.put(("done", None, e))
+
+    def _on_pattern_done(self, placements, error, width, height, cfg):
+        self._set_solving(False)
+        if error is not None:
+            self.status_var.set("")
+            messagebox.showerror("Solver error", str(error))
+            return
+        if placements is None:
+            self.status_var.set(f"No more patterns ({self._pattern_count} shown).")
+            self._pattern_iter = None
+            self._pattern_key = None
+            return
+        self._pattern_count += 1
+        self.status_var.set(f"Pattern #{self._pattern_count}")
+        self._show_tiling(placements, width, height, cfg.grid_size, cfg.formats)
 
-            img = draw_tiling(placements, w_out, h_out, G, formats)
-            self.last_image = img
-            self._update_preview()
+    def _show_tiling(self, placements, width, height, G, formats):
+        self._last_tiling = (placements, width, height, G, formats)
+        self._preview_cache.clear()
+        self._render_preview()
 
-        finally:
-            # Restore normal cursor and re-enable buttons
-            self.config(cursor="")
-            self.preview_canvas.config(cursor="")
-            self.solve_btn.config(state="normal")
-            self.save_btn.config(state="normal")
-            self.update_idletasks()
+    def _on_stop(self):
+        self._stop_event.set()
+        if self._tiling_model is not None and not self._server:
+            self._tiling_model.stop()
+        self.status_var.set("Stopping...")
 
     def _edit_type(self):
         sel = self.tree_types.selection()
@@ -289,14 +522,15 @@ class TilingApp(tk.Tk):
         self.wait_window(dialog)
 
     def _on_save_image(self):
-        if not self.last_image:
+        if not self._last_tiling:
             messagebox.showwarning("No image", "Run the solver first.")
             return
         path = filedialog.asksaveasfilename(defaultextension=".png",
                                             filetypes=[("PNG", "*.png")])
         if path:
             try:
-                self.last_image.save(path)
+                # full resolution is rendered only now, when it is needed
+                draw_tiling(*self._last_tiling).save(path)
                 messagebox.showinfo("Saved", f"Image saved to:\n{path}")
             except Exception as e:
                 messagebox.showerror("Save error", str(e))
@@ -0,0 +1,20 @@
+from core.cache import SolutionCache, cached_solve
+from core.tiling import TilingConfig, TilingModel
+
+CFG = TilingConfig(formats={1: (20, 20), 2: (40, 20)}, weights={1: 1, 2: 3},
+                   grid_size=20, max_time_in_seconds=30, num_search_workers=1)
+
+
+def test_cached_optimum_skips_the_model_build(tmp_path):
+    cache = SolutionCache(str(tmp_path / "cache.sqlite"))
+    built = []
+
+    def build():
+        built.append(TilingModel(80, 80, CFG))
+        return built[-1]
+
+    first = cached_solve(80, 80, CFG, cache, model=build)
+    assert first.status == "OPTIMAL" and not first.cached
+    again = cached_solve(80, 80, CFG, cache, model=build)
+    assert again.cached and again.objective == first.objective
+    assert len(built) == 1
@@ -0,0 +1,21 @@
+import pytest
+
+from core.cli import expand_jobs
+
+SPEC = {"defaults": {"formats": {"1": [20, 20], "2": [40, 20]}, "weights": {"1": 2, "2": 3}}}
+
+
+def test_sweep_over_runtime_fields_gives_distinct_ids():
+    spec = dict(SPEC, sweep={"width": [120], "height": [120],
+                             "max_time_in_seconds": [2, 4], "random_seed": [1, 2]})
+    ids = [job[0] for job in expand_jobs(spec)]
+    assert len(set(ids)) == 4
+    assert ids == [job[0] for job in expand_jobs(spec)]
+
+
+def test_duplicate_ids_are_rejected():
+    with pytest.raises(ValueError):
+        expand_jobs(dict(SPEC, sweep={"width": [120, 120], "height": [120]}))
+    with pytest.raises(ValueError):
+        expand_jobs(dict(SPEC, jobs=[{"id": "a", "width": 120, "height": 120},
+                                     {"id": "a", "width": 160, "height": 120}]))
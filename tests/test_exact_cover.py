@@ -0,0 +1,58 @@
+import dataclasses
+
+import pytest
+
+from core.exact_cover import ExactCoverModel
+from core.lns import violations
+from core.tiling import TilingConfig, TilingModel, _tile_cells, solve_torus_tiling
+
+
+def _check(result, width, height, cfg):
+    G = cfg.grid_size
+    assert violations(result.placements, width // G, height // G,
+                      _tile_cells(cfg.formats, G), cfg) == []
+
+
+def test_large_floor_does_not_recurse():
+    # 40×40 = 1600 cells, one search level per tile
+    cfg = TilingConfig(formats={1: (20, 20), 2: (40, 20)}, weights={1: 1, 2: 1},
+                       grid_size=20, backend="exact_cover", max_time_in_seconds=30)
+    result = solve_torus_tiling(800, 800, cfg)
+    assert result.status == "FEASIBLE"
+    _check(result, 800, 800, cfg)
+
+
+# (width, height, formats, weights, no straight lines, wrap)
+FLOORS = [
+    (80, 80, {1: (20, 20), 2: (40, 20)}, {1: 1, 2: 3}, True, True),
+    (100, 60, {1: (20, 20), 2: (40, 20)}, {1: 1, 2: 1}, True, True),
+    (60, 60, {1: (40, 40)}, {1: 1}, False, True),
+    (120, 80, {1: (20, 20), 2: (60, 20), 3: (40, 40)}, {1: 4, 2: 1, 3: 2}, True, False),
+    # a turned 2 is 5 cells wide on a 4-cell torus and wraps onto itself
+    (80, 240, {1: (20, 20), 2: (40, 100)}, {1: 5, 2: 1}, False, True),
+    (40, 60, {1: (20, 20), 2: (100, 20)}, {1: 3, 2: 1}, True, True),
+]
+
+
+@pytest.mark.parametrize("width,height,formats,weights,no_lines,wrap", FLOORS)
+def test_exact_cover_agrees_with_cpsat(width, height, formats, weights, no_lines, wrap):
+    cfg = TilingConfig(formats=formats, weights=weights, grid_size=20,
+                       max_time_in_seconds=30, num_search_workers=1, random_seed=0,
+                       enforce_no_straight_lines=no_lines, enforce_wrap=wrap,
+                       four_corner_penalty_weight=None)
+    cpsat = TilingModel(width, height, cfg).solve()
+    exact = ExactCoverModel(width, height, cfg).solve()
+    assert cpsat.status in ("OPTIMAL", "INFEASIBLE")
+    assert exact.found == cpsat.found
+    if exact.found:
+        _check(exact, width, height, cfg)
+        assert exact.objective >= cpsat.objective
+
+
+def test_wrapped_long_tile_gives_the_cpsat_optimum():
+    cfg = TilingConfig(formats={1: (20, 20), 2: (40, 100)}, weights={1: 5, 2: 1},
+                       grid_size=20, enforce_no_straight_lines=False,
+                       four_corner_penalty_weight=None, max_time_in_seconds=30)
+    cpsat = solve_torus_tiling(80, 240, cfg)
+    exact = solve_torus_tiling(80, 240, dataclasses.replace(cfg, backend="exact_cover"))
+    assert cpsat.objective == exact.objective == 5
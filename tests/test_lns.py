@@ -0,0 +1,20 @@
+import time
+
+from core.lns import solve_lns, violations
+from core.tiling import TilingConfig, _tile_cells
+
+CFG = TilingConfig(formats={1: (20, 20), 2: (40, 20), 3: (60, 40), 4: (40, 40)},
+                   weights={1: 5, 2: 3, 3: 1, 4: 2}, grid_size=20,
+                   max_time_in_seconds=4, num_search_workers=1, random_seed=0,
+                   multiscale=True)
+
+
+def test_multiscale_start_leaves_time_for_lns():
+    t0 = time.perf_counter()
+    result = solve_lns(600, 600, CFG)
+    elapsed = time.perf_counter() - t0
+    assert result.status == "FEASIBLE"
+    assert result.stats["rounds"] >= 1
+    assert elapsed < CFG.max_time_in_seconds + 1
+    tile_cells = _tile_cells(CFG.formats, CFG.grid_size, CFG.break_symmetries)
+    assert violations(result.placements, 30, 30, tile_cells, CFG) == []
@@ -0,0 +1,61 @@
+import pytest
+
+from core.precheck import infeasible, precheck
+from core.tiling import TilingConfig
+
+
+def _cfg(formats, **kwargs):
+    return TilingConfig(formats=formats, weights={k: 1 for k in formats}, grid_size=20,
+                        **kwargs)
+
+
+SQUARES = {1: (20, 20), 2: (40, 20)}
+
+# (width, height, config, start of the reason)
+REJECTED = [
+    (0, 120, _cfg(SQUARES), "Floor size"),
+    (130, 120, _cfg(SQUARES), "Floor width 130 cm is not a multiple"),
+    (120, 130, _cfg(SQUARES), "Floor height 130 cm is not a multiple"),
+    (120, 120, _cfg({1: (20, 20), 2: (30, 20)}), "Tile 2 (30×20 cm) is not a multiple"),
+    (120, 120, _cfg(SQUARES, min_counts={2: 3}, max_counts={2: 2}),
+     "Tile 2: min count 3 exceeds max count 2"),
+    (120, 120, _cfg(SQUARES, max_counts={1: 0, 2: 0}), "Every tile format has max count 0"),
+    (80, 80, _cfg(SQUARES, min_counts={2: 9}), "Min counts cover"),
+    (100, 100, _cfg({1: (40, 40), 2: (60, 40)}, enforce_wrap=False,
+                    enforce_no_straight_lines=False), "No tile counts"),
+    (100, 80, _cfg({1: (40, 40), 2: (40, 80)}, enforce_wrap=False,
+                   enforce_no_straight_lines=False), "No row of tiles"),
+    (80, 100, _cfg({1: (40, 40), 2: (40, 80)}, enforce_wrap=False,
+                   enforce_no_straight_lines=False), "No column of tiles"),
+    (60, 120, _cfg({1: (40, 40), 2: (60, 40)}, min_counts={1: 1}, enforce_wrap=False,
+                   enforce_no_straight_lines=False), "Tile 1 (40×40 cm) cannot be placed"),
+    # one cell wide: a long tile wraps onto itself but crosses no line
+    (20, 120, _cfg({1: (20, 20), 2: (20, 100)}), "No tile spans more than one grid cell across"),
+    (120, 20, _cfg({1: (20, 20), 2: (20, 100)}), "No tile spans more than one grid cell down"),
+    (120, 120, _cfg({1: (20, 20), 2: (20, 100)}, max_counts={2: 0},
+                    enforce_no_straight_lines=False),
+     "No tile spans more than one grid cell across, so the wrap rule"),
+]
+
+
+@pytest.mark.parametrize("width,height,cfg,reason", REJECTED)
+def test_rejection_reasons(width, height, cfg, reason):
+    assert precheck(width, height, cfg).startswith(reason)
+    result = infeasible(width, height, cfg)
+    assert result.status == "INFEASIBLE" and result.reason.startswith(reason)
+    assert "precheck" in result.timings
+
+
+def test_feasible_floor_passes():
+    assert precheck(120, 120, _cfg(SQUARES)) is None
+    assert infeasible(120, 120, _cfg(SQUARES)) is None
+
+
+def test_tile_longer_than_the_floor_wraps_onto_itself():
+    # 5 cells long on a 4-cell floor, as TilingModel and core.lns.violations allow
+    cfg = _cfg({1: (20, 20), 2: (40, 100)}, min_counts={2: 1},
+               enforce_no_straight_lines=False)
+    assert precheck(80, 240, cfg) is None
+    # a one-cell-wide floor: wrapping is still possible
+    assert precheck(20, 120, _cfg({1: (20, 20), 2: (20, 100)},
+                                  enforce_no_straight_lines=False)) is None
@@ -0,0 +1,65 @@
+import dataclasses
+import time
+
+import pytest
+
+from core.server import JobQueue, LocalClient, ServerError, route
+from core.tiling import TilingConfig, solve_torus_tiling
+
+CFG = TilingConfig(formats={1: (30, 30), 2: (30, 60), 3: (60, 60), 4: (60, 90)},
+                   weights={1: 5, 2: 3, 3: 2, 4: 1}, grid_size=30,
+                   max_time_in_seconds=1, num_search_workers=1, random_seed=0)
+
+
+@pytest.fixture
+def jobs():
+    jobs = JobQueue(cores=1, cache_path=None, in_process=True, max_queued=1)
+    yield jobs
+    jobs.close()
+
+
+def _wait_running(jobs):
+    deadline = time.time() + 10
+    while jobs.status()["running"] == 0:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_solve_matches_a_local_solve(jobs):
+    cfg = dataclasses.replace(CFG, max_time_in_seconds=10)
+    result = LocalClient(jobs).solve(120, 120, cfg, poll_interval=0.05)
+    assert result.status == "OPTIMAL"
+    assert result.objective == solve_torus_tiling(120, 120, cfg).objective
+
+
+def test_identical_jobs_are_deduplicated(jobs):
+    client = LocalClient(jobs)
+    first = client.submit(600, 600, CFG)
+    again = client.submit(600, 600, CFG)
+    shorter = client.submit(600, 600, dataclasses.replace(CFG, max_time_in_seconds=0.5))
+    assert again["id"] == shorter["id"] == first["id"]
+    assert again["duplicate"] and shorter["duplicate"]
+    # a longer time limit is not served by the shorter job
+    _wait_running(jobs)
+    longer = client.submit(600, 600, dataclasses.replace(CFG, max_time_in_seconds=1.5))
+    assert longer["id"] != first["id"]
+    assert "duplicate" not in longer
+
+
+def test_full_queue_answers_503(jobs):
+    client = LocalClient(jobs)
+    client.submit(600, 600, CFG)
+    _wait_running(jobs)
+    client.submit(570, 600, CFG)  # waits for the only worker
+    body = {"width": 540, "height": 600, "config": dataclasses.asdict(CFG)}
+    code, reply = route(jobs, "POST", "/jobs", body)
+    assert code == 503
+    with pytest.raises(ServerError):
+        client.submit(540, 600, CFG)
+
+
+def test_precheck_rejection_is_answered_at_once(jobs):
+    job = LocalClient(jobs).submit(125, 120, CFG)
+    assert job["state"] == "done"
+    assert job["result"]["status"] == "INFEASIBLE"
+    assert "grid size" in job["result"]["reason"]
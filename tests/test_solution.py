@@ -0,0 +1,47 @@
+import numpy as np
+
+from core.lns import violations
+from core.solution import TilingSolution
+from core.tiling import TilingConfig, TilingModel
+
+FORMATS = {1: (20, 20), 2: (40, 20), 3: (40, 40)}
+CFG = TilingConfig(formats=FORMATS, weights={1: 3, 2: 2, 3: 1}, grid_size=20,
+                   num_search_workers=1, random_seed=0)
+
+
+def test_valid_tiling_round_trips(tmp_path):
+    model = TilingModel(120, 80, CFG)
+    result = model.solve()
+    assert violations(result.placements, model.W, model.H, model.tile_cells, CFG) == []
+    solution = TilingSolution.from_result(result, FORMATS)
+    assert solution.validate(CFG) == []
+    for path in (str(tmp_path / "s.npz"), str(tmp_path / "s")):
+        solution.save(path)
+        loaded = TilingSolution.load(path, mmap=True)
+        assert loaded.to_placements() == result.placements
+        assert np.array_equal(loaded.grid, solution.grid)
+
+
+def test_empty_tiling_reports_uncovered_cells():
+    found = TilingSolution.from_placements([], 120, 120, 20, FORMATS).validate(CFG)
+    assert "36 cells not covered" in found
+
+
+def test_unknown_format_ids_are_reported():
+    solution = TilingSolution.from_placements([(1, 0, 0, 0), (9, 1, 0, 0), (0, 2, 0, 0)],
+                                              60, 20, 20, FORMATS)
+    found = solution.validate(CFG)
+    assert "unknown format ids [0, 9]" in found
+    assert "2 cells not covered" in found
+    assert solution.tile_at(1, 0) is None
+
+
+def test_tile_longer_than_the_floor_wraps_onto_itself():
+    # a turned 2 is 5 cells wide on the 4-cell torus, as TilingModel allows
+    formats = {1: (20, 20), 2: (40, 100)}
+    cfg = TilingConfig(formats=formats, weights={1: 5, 2: 1}, grid_size=20,
+                       enforce_no_straight_lines=False, four_corner_penalty_weight=None)
+    placements = [(2, 1, 2, 0), (2, 1, 9, 0), (2, 3, 2, 0), (2, 3, 9, 0), (2, 3, 7, 1)]
+    model = TilingModel(80, 240, cfg)
+    assert violations(placements, model.W, model.H, model.tile_cells, cfg) == []
+    assert TilingSolution.from_placements(placements, 80, 240, 20, formats).validate(cfg) == []
@@ -0,0 +1,194 @@
+from collections import Counter
+
+import dataclasses
+
+import pytest
+
+from ortools.sat.python import cp_model
+
+from core.lns import violations
+from core.tiling import TilingConfig, TilingModel, canonical_form
+
+FORMAT_SETS = [
+    {1: (20, 20), 2: (40, 20)},
+    {1: (20, 20), 2: (60, 20), 3: (40, 40)},
+    # longer than the smaller floors, so placements wrap onto themselves
+    {1: (20, 20), 2: (100, 20), 3: (20, 80)},
+]
+FLOORS = [(60, 60), (80, 60), (100, 40), (40, 40), (120, 80)]
+
+
+def _baseline_model(W, H, formats, G, cfg):
+    """
+    Coverage, wrap, straight-line and four-corner constraints built the
+    way solve_torus_tiling built them before the placement indexes, by
+    rescanning every placement for every cell, line and lattice point.
+    """
+    model = cp_model.CpModel()
+    tile_cells = {k: [(w//G, h//G), (h//G, w//G)] for k, (w, h) in formats.items()}
+    X = {}
+    for k in formats:
+        for o, (wc, hc) in enumerate(tile_cells[k]):
+            for i in range(W):
+                for j in range(H):
+                    X[k,i,j,o] = model.NewBoolVar(f"X_{k}_{i}_{j}_{o}")
+
+    def placements():
+        for k in formats:
+            for o, (wc, hc) in enumerate(tile_cells[k]):
+                for i in range(W):
+                    for j in range(H):
+                        yield X[k,i,j,o], i, j, wc, hc
+
+    for x in range(W):
+        for y in range(H):
+            model.Add(sum(v for v, i, j, wc, hc in placements()
+                          if ((x-i) % W) < wc and ((y-j) % H) < hc) == 1)
+    if cfg.enforce_wrap:
+        model.Add(sum(v for v, i, j, wc, hc in placements() if j+hc > H) >= 1)
+        model.Add(sum(v for v, i, j, wc, hc in placements() if i+wc > W) >= 1)
+    if cfg.enforce_no_straight_lines:
+        for b in range(W):
+            model.Add(sum(v for v, i, j, wc, hc in placements()
+                          if 0 < ((b-i) % W) < wc) >= 1)
+        for r in range(H):
+            model.Add(sum(v for v, i, j, wc, hc in placements()
+                          if 0 < ((r-j) % H) < hc) >= 1)
+    if cfg.four_corner_penalty_weight is not None:
+        for b in range(W):
+            for r in range(H):
+                C = model.NewBoolVar(f"C_{b}_{r}")
+                corners = [v for v, i, j, wc, hc in placements()
+                           if (i % W == b and j % H == r) or
+                              ((i+wc) % W == b and j % H == r) or
+                              (i % W == b and (j+hc) % H == r) or
+                              ((i+wc) % W == b and (j+hc) % H == r)]
+                model.Add(sum(corners) == 4).OnlyEnforceIf(C)
+                model.Add(sum(corners) <= 3).OnlyEnforceIf(C.Not())
+    return model
+
+
+def _linear_constraints(model, skip=()):
+    """Multiset of linear constraints by variable name, so models with
+    differently numbered variables compare equal."""
+    proto = model.Proto()
+    names = [v.name for v in proto.variables]
+
+    def name(ref):
+        return names[ref] if ref >= 0 else "not " + names[-ref - 1]
+
+    found = Counter()
+    for ct in proto.constraints:
+        assert ct.has_linear()
+        terms = sorted(zip((name(v) for v in ct.linear.vars), ct.linear.coeffs))
+        if any(n.startswith(skip) for n, _ in terms):
+            continue
+        found[(tuple(terms), tuple(ct.linear.domain),
+               tuple(sorted(name(e) for e in ct.enforcement_literal)))] += 1
+    return found
+
+
+@pytest.mark.parametrize("formats", FORMAT_SETS)
+@pytest.mark.parametrize("width,height", FLOORS)
+def test_indexed_builder_matches_baseline(width, height, formats):
+    G = 20
+    cfg = TilingConfig(formats=formats, weights={k: 1 for k in formats}, grid_size=G)
+    baseline = _baseline_model(width // G, height // G, formats, G, cfg)
+    indexed = TilingModel(width, height, cfg).model
+    # the count links N_k == sum(X) and the num_corners sum are new
+    assert _linear_constraints(indexed, skip=("N_", "num_corners")) == \
+        _linear_constraints(baseline)
+
+
+# (width, height, formats, weights, no straight lines)
+SMALL_FLOORS = [
+    # all small squares are cheapest, so the corner penalty changes the optimum
+    (80, 80, {1: (20, 20), 2: (40, 20)}, {1: 1, 2: 3}, False),
+    (100, 100, {1: (20, 20), 2: (40, 20), 3: (60, 20)}, {1: 2, 2: 3, 3: 4}, True),
+    (120, 80, {1: (20, 20), 2: (60, 20), 3: (40, 40)}, {1: 4, 2: 1, 3: 2}, True),
+    (100, 80, {1: (20, 20), 2: (60, 20), 3: (40, 40)}, {1: 3, 2: 2, 3: 5}, True),
+    # full-width tiles meet themselves, which is no four-corner point
+    (60, 40, {1: (20, 20), 2: (60, 40), 3: (40, 20)}, {1: 3, 2: 1, 3: 2}, False),
+    (80, 60, {1: (20, 20), 2: (80, 20), 3: (40, 20)}, {1: 3, 2: 1, 3: 2}, False),
+]
+
+
+@pytest.mark.parametrize("break_symmetries", [False, True])
+@pytest.mark.parametrize("penalty", [None, 1])
+@pytest.mark.parametrize("width,height,formats,weights,no_lines", SMALL_FLOORS)
+def test_seam_formulation_matches_placement(width, height, formats, weights, no_lines,
+                                            penalty, break_symmetries):
+    cfg = TilingConfig(formats=formats, weights=weights, grid_size=20,
+                       max_time_in_seconds=30, num_search_workers=1, random_seed=0,
+                       enforce_no_straight_lines=no_lines,
+                       four_corner_penalty_weight=penalty,
+                       break_symmetries=break_symmetries)
+    results = {}
+    for formulation in ("placement", "seam"):
+        model = TilingModel(width, height, dataclasses.replace(cfg, formulation=formulation))
+        result = model.solve()
+        assert result.status in ("OPTIMAL", "INFEASIBLE")
+        if result.found:
+            assert violations(result.placements, model.W, model.H,
+                              model.tile_cells, cfg) == []
+        results[formulation] = result
+    assert results["seam"].status == results["placement"].status
+    assert results["seam"].objective == results["placement"].objective
+
+
+def test_stopped_enumeration_does_not_stop_the_next_solve():
+    cfg = TilingConfig(formats={1: (20, 20), 2: (40, 20)}, weights={1: 1, 2: 3},
+                       grid_size=20, max_time_in_seconds=30, num_search_workers=1)
+    model = TilingModel(80, 80, cfg)
+    patterns = model.iter_solutions()
+    next(patterns)
+    model.stop()
+    list(patterns)
+    assert model.solve().status == "OPTIMAL"
+
+    patterns = model.iter_solutions()
+    next(patterns)
+    model.stop()
+    patterns.close()
+    assert model.solve().status == "OPTIMAL"
+
+
+@pytest.mark.parametrize("dihedral", [False, True])
+def test_enumerated_patterns_are_distinct(dihedral):
+    cfg = TilingConfig(formats={1: (20, 20), 2: (40, 20), 3: (60, 20)},
+                       weights={1: 1, 2: 1, 3: 1}, grid_size=20,
+                       max_time_in_seconds=30)
+    model = TilingModel(100, 100, cfg)
+    patterns = list(model.iter_solutions(limit=10, dihedral=dihedral))
+    assert len(patterns) == 10
+    forms = {canonical_form(p, model.W, model.H, model.tile_cells, dihedral)
+             for p in patterns}
+    assert len(forms) == len(patterns)
+    for p in patterns:
+        assert violations(p, model.W, model.H, model.tile_cells, cfg) == []
+
+
+# (side, formats, weights, corner penalty)
+SQUARE_FLOORS = [
+    (80, {1: (20, 20), 2: (40, 20)}, {1: 1, 2: 3}, 1),
+    (100, {1: (20, 20), 2: (40, 20), 3: (60, 20)}, {1: 2, 2: 3, 3: 4}, None),
+    (120, {1: (20, 20), 2: (60, 20), 3: (40, 40)}, {1: 4, 2: 1, 3: 2}, 1),
+]
+
+
+@pytest.mark.parametrize("side,formats,weights,penalty", SQUARE_FLOORS)
+def test_symmetry_breaking_keeps_the_optimum(side, formats, weights, penalty):
+    cfg = TilingConfig(formats=formats, weights=weights, grid_size=20,
+                       max_time_in_seconds=30, num_search_workers=1, random_seed=0,
+                       four_corner_penalty_weight=penalty)
+    results = []
+    for flags in [{}, {"break_symmetries": True},
+                  {"break_symmetries": True, "break_dihedral_symmetries": True}]:
+        broken = dataclasses.replace(cfg, **flags)
+        model = TilingModel(side, side, broken)
+        result = model.solve()
+        assert result.status == "OPTIMAL"
+        assert violations(result.placements, model.W, model.H,
+                          model.tile_cells, broken) == []
+        results.append(result.objective)
+    assert len(set(results)) == 1